@@ -4,6 +4,7 @@ from .core.netcdf import (
     list_netcdf_vars,
     convert_nc_var_to_dataarray,
     extract_netcdf_as_dataset,
+    pack_dataset_vars,
     rename_dataset_vars,
     write_netcdf,
     check_netcdf,
@@ -11,6 +11,7 @@ from .read import (
     extract_netcdf_as_dataset,
 )
 from .write import (
+    pack_dataset_vars,
     rename_dataset_vars,
     write_netcdf,
 )
@@ -23,6 +24,7 @@ __all__ = [
     "check_netcdf",
     "convert_nc_var_to_dataarray",
     "extract_netcdf_as_dataset",
+    "pack_dataset_vars",
     "rename_dataset_vars",
     "write_netcdf",
     "subset_netcdf",
@@ -1,27 +1,35 @@
 """Reading and inspection functions for netCDF files."""
 
+import math
 import warnings
+from collections import defaultdict, deque
 
 import netCDF4 as nc
+import numpy as np
 import xarray as xr
+from xarray.backends import BackendArray
+from xarray.core import indexing
 
+from ...utils.constants import (
+    NETCDF_CHUNK_CACHE_MAX_BYTES,
+    NETCDF_READ_SLAB_BYTES,
+)
 from ...utils.decorators import handle_file_errors
+from ...utils.io import is_remote_path
 
+def _collect_netcdf_var_paths(group: nc.Dataset) -> list[str]:
+    """Collect all variable paths from a netCDF group hierarchy.
 
-def _collect_netcdf_var_paths(
-    group: nc.Dataset, prefix: str = ""
-) -> list[str]:
-    """Recursively collect all variable paths from a netCDF group.
-
-    Traverses a netCDF group hierarchy and returns all variable paths
-    as a flat list using forward slashes as separators.
+    Walks the group tree iteratively (depth-first, parents before
+    children) and returns all variable paths as a flat list using
+    forward slashes as separators. Each group's path prefix is built
+    once, so deep hierarchies cost no extra frames or string joins.
 
     Parameters
     ----------
     group : nc.Dataset
         The netCDF group to traverse (can be root dataset or subgroup).
-    prefix : str, default ""
-        Current path prefix for building full variable paths.
+        An ``h5netcdf`` group works as well.
 
     Returns
     -------
@@ -29,23 +37,27 @@ def _collect_netcdf_var_paths(
         All variable paths found in the group and its subgroups.
     """
     var_paths = []
+    stack = deque([(group, "")])
 
-    for var_name in group.variables:
-        var_path = f"{prefix}/{var_name}" if prefix else var_name
-        var_paths.append(var_path)
-
-    for sub_name in group.groups:
-        sub_path = f"{prefix}/{sub_name}" if prefix else sub_name
-        var_paths.extend(
-            _collect_netcdf_var_paths(
-                group=group.groups[sub_name],
-                prefix=sub_path,
-            )
+    while stack:
+        current, prefix = stack.pop()
+        var_paths.extend([prefix + var_name for var_name in current.variables])
+
+        # Push in reverse so subgroups are visited in file order
+        stack.extend(
+            (sub_group, f"{prefix}{sub_name}/")
+            for sub_name, sub_group in reversed(list(current.groups.items()))
         )
 
     return var_paths
 
 
+@handle_file_errors
+def _open_netcdf(input_path: str) -> nc.Dataset:
+    """Open a netCDF file for reading with clear file-error messages."""
+    return nc.Dataset(input_path, "r")
+
+
 @handle_file_errors
 def list_netcdf_vars(nc_input: str) -> list[str]:
     """Get all available variable paths in a netCDF file.
@@ -106,8 +118,210 @@ def check_netcdf(nc_input: str | list[str]) -> str | None | list[str]:
         return faulty_files
 
 
+def _read_nc_var_by_chunk(nc_var: nc.Variable) -> np.ndarray:
+    """Read all values of a variable in slabs aligned to its chunking.
+
+    Chunked variables are read along the first dimension in slabs that are
+    whole multiples of the on-disk chunk size, so every read request covers
+    complete chunks and each chunk is decompressed exactly once. Contiguous,
+    netCDF-3, scalar, single-slab, and non-numeric (e.g. variable-length
+    string) variables are read in one call.
+
+    Parameters
+    ----------
+    nc_var : netCDF4.Variable
+        The netCDF4 variable to read.
+
+    Returns
+    -------
+    np.ndarray
+        All values of the variable.
+    """
+    # "contiguous" for unchunked netCDF-4 variables, None for netCDF-3
+    chunking = nc_var.chunking()
+    if (
+        not isinstance(chunking, list)
+        or nc_var.ndim == 0
+        or not isinstance(nc_var.dtype, np.dtype)
+    ):
+        return nc_var[:]
+
+    n_rows = nc_var.shape[0]
+    row_bytes = nc_var.dtype.itemsize * int(np.prod(nc_var.shape[1:]))
+    rows_per_slab = max(1, NETCDF_READ_SLAB_BYTES // max(row_bytes, 1))
+    step = max(1, rows_per_slab // chunking[0]) * chunking[0]
+    if step >= n_rows:
+        return nc_var[:]
+
+    data = np.empty(nc_var.shape, dtype=nc_var.dtype)
+    for start in range(0, n_rows, step):
+        data[start:start + step] = nc_var[start:start + step]
+    return data
+
+
+def _tune_var_chunk_cache(
+    nc_var: nc.Variable, cache_bytes: int | None = None,
+) -> None:
+    """Enlarge a chunked variable's HDF5 chunk cache before reading it.
+
+    The netCDF default cache is often smaller than a single chunk of
+    satellite products, so chunks shared by consecutive reads get
+    decompressed again. By default the cache is sized to hold one row of
+    chunks along the first dimension, capped at
+    ``NETCDF_CHUNK_CACHE_MAX_BYTES``. The cache is never shrunk.
+
+    Parameters
+    ----------
+    nc_var : netCDF4.Variable
+        The netCDF4 variable about to be read.
+    cache_bytes : int, optional
+        Cache size in bytes. If None, derived from the chunk shape.
+    """
+    chunking = nc_var.chunking()
+    if not isinstance(chunking, list) or not isinstance(nc_var.dtype, np.dtype):
+        return
+
+    if cache_bytes is None:
+        chunk_bytes = nc_var.dtype.itemsize * math.prod(chunking)
+        chunks_per_row = math.prod(
+            -(-size // chunk)
+            for size, chunk in zip(nc_var.shape[1:], chunking[1:])
+        )
+        cache_bytes = min(
+            chunk_bytes * chunks_per_row, NETCDF_CHUNK_CACHE_MAX_BYTES
+        )
+
+    size, nelems, preemption = nc_var.get_var_chunk_cache()
+    if cache_bytes > size:
+        nc_var.set_var_chunk_cache(
+            size=cache_bytes, nelems=nelems, preemption=preemption
+        )
+
+
+def _release_var_chunk_cache(nc_var: nc.Variable) -> None:
+    """Free the chunks a variable holds in its HDF5 chunk cache.
+
+    Re-applying the current cache settings makes libnetcdf reopen the
+    underlying HDF5 dataset, which flushes and drops cached chunks while
+    the file stays open. Variables without chunks (contiguous or netCDF-3)
+    are left alone.
+    """
+    if not isinstance(nc_var.chunking(), list):
+        return
+    nc_var.set_var_chunk_cache(*nc_var.get_var_chunk_cache())
+
+
+class _NcVarArray(BackendArray):
+    """Lazily read raw values from an open netCDF4 variable.
+
+    Lets xarray defer reading until the values are needed (e.g. while
+    writing), so only one variable has to be in memory at a time. The
+    source file must stay open until then.
+    """
+
+    def __init__(self, nc_var: nc.Variable):
+        # Raw values: no scaling and fill values kept, set once per variable
+        nc_var.set_auto_maskandscale(False)
+        self.nc_var = nc_var
+        self.shape = nc_var.shape
+        # Variable-length strings are read as object arrays
+        if isinstance(nc_var.dtype, np.dtype):
+            self.dtype = nc_var.dtype
+        else:
+            self.dtype = np.dtype(object)
+
+    def __getitem__(self, key):
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.OUTER, self._getitem,
+        )
+
+    def _getitem(self, key: tuple) -> np.ndarray:
+        if all(isinstance(k, slice) and k == slice(None) for k in key):
+            data = _read_nc_var_by_chunk(self.nc_var)
+            # The whole variable has been read; cached chunks are not reused
+            _release_var_chunk_cache(self.nc_var)
+            return data
+        return self.nc_var[key]
+
+
+def _open_h5_file(input_path: str):
+    """Open a netCDF-4 file with h5py, or return None if not possible.
+
+    h5py is optional; None is returned when it is not installed or the
+    file is not HDF5-based (e.g. netCDF-3).
+    """
+    try:
+        import h5py
+    except ImportError:
+        return None
+
+    try:
+        return h5py.File(input_path, "r")
+    except OSError:
+        return None
+
+
+def _memmap_nc_var(
+    h5_file, input_path: str, var_path: str, nc_var: nc.Variable,
+) -> np.ndarray | None:
+    """Memory-map a contiguous, uncompressed variable straight from disk.
+
+    HDF5 only applies filters to chunked datasets, so contiguous storage
+    means the raw bytes sit unmodified at one file offset. The returned
+    array is read-only and backed by the OS page cache instead of a copy
+    through libnetcdf. Returns None when the variable cannot be mapped.
+    """
+    if (
+        nc_var.chunking() != "contiguous"
+        or nc_var.ndim == 0
+        or not isinstance(nc_var.dtype, np.dtype)
+    ):
+        return None
+
+    try:
+        dset = h5_file[var_path]
+    except KeyError:
+        return None
+
+    # None if storage was never allocated (e.g. all fill values)
+    offset = dset.id.get_offset()
+    if offset is None or dset.shape != nc_var.shape:
+        return None
+
+    # Keep the on-disk byte order, as netCDF4 does for non-native variables
+    return np.memmap(
+        input_path, dtype=dset.dtype, mode="r", offset=offset,
+        shape=dset.shape,
+    )
+
+
+def _nc_var_to_tuple(
+    nc_var: nc.Variable, data: np.ndarray | None = None,
+) -> tuple[tuple[str, ...], np.ndarray, dict]:
+    """Return ``(dims, data, attrs)`` for a netCDF4 variable.
+
+    Raw values are read (fill values kept, no scaling) unless ``data`` is
+    given. The tuple can be passed straight to :class:`xarray.Dataset`, so
+    many variables are turned into xarray Variables in a single pass
+    without building an intermediate DataArray for each.
+    """
+    # __dict__ fetches all attributes in one pass
+    attrs = dict(nc_var.__dict__)
+
+    # Disable automatic masking/scaling to preserve raw data exactly.
+    # set_auto_maskandscale(False) disables both scale_factor/add_offset
+    # and _FillValue-to-NaN conversion. The read then returns a plain
+    # ndarray (not a masked array), which xarray wraps without copying;
+    # _FillValue stays in attrs so it is written back unchanged.
+    if data is None:
+        nc_var.set_auto_maskandscale(False)
+        data = _read_nc_var_by_chunk(nc_var)
+
+    return nc_var.dimensions, data, attrs
+
+
 def convert_nc_var_to_dataarray(
-    nc_var: nc.Variable, var_path: str,
+    nc_var: nc.Variable, var_path: str, data: np.ndarray | None = None,
 ) -> xr.DataArray:
     """Convert a netCDF4 variable to an xarray DataArray.
 
@@ -120,30 +334,183 @@ def convert_nc_var_to_dataarray(
         The netCDF4 variable to convert.
     var_path : str
         Path/name for the variable.
+    data : array-like, optional
+        Values already read from ``nc_var``, or a lazily indexed array.
+        If None, reads ``nc_var``.
 
     Returns
     -------
     xr.DataArray
         DataArray with original data values and attributes preserved.
     """
-    attrs = {k: nc_var.getncattr(k) for k in nc_var.ncattrs()}
-
-    # Disable automatic masking/scaling to preserve raw data exactly.
-    # set_auto_maskandscale(False) disables both scale_factor/add_offset
-    # and _FillValue-to-NaN conversion.
-    nc_var.set_auto_maskandscale(False)
+    dims, data, attrs = _nc_var_to_tuple(nc_var, data=data)
 
     return xr.DataArray(
-        data=nc_var[:],
-        dims=nc_var.dimensions,
+        data=data,
+        dims=dims,
         attrs=attrs,
         name=var_path,
     )
 
 
+def _filter_existing_var_paths(
+    root_ds: nc.Dataset, input_path: str, var_paths: list[str],
+) -> list[str]:
+    """Drop variable paths that are not in the file, warning once.
+
+    Checks against one walk of the group tree rather than a failed lookup
+    per missing path.
+    """
+    available = set(_collect_netcdf_var_paths(root_ds))
+    missing = [p for p in var_paths if p not in available]
+    if not missing:
+        return var_paths
+
+    warnings.warn(f"Variables not found in {input_path}: {missing}")
+    return [p for p in var_paths if p in available]
+
+
+def _extract_nc_vars(
+    root_ds: nc.Dataset,
+    input_path: str,
+    var_paths: list[str],
+    chunk_cache_bytes: int | None = None,
+    memmap: bool = False,
+    defer_read: bool = False,
+    check_paths: bool = True,
+) -> xr.Dataset:
+    """Read variables from an open netCDF file into a flat xarray Dataset.
+
+    Shared by :func:`extract_netcdf_as_dataset` and callers that already
+    hold the file open (e.g. to list variables first), so the file is
+    opened only once. With ``defer_read``, values are wrapped lazily and
+    read only when used, which requires ``root_ds`` to stay open until then.
+    Callers that have already validated ``var_paths`` against the file pass
+    ``check_paths=False`` to skip walking the group tree again.
+    """
+    if check_paths:
+        var_paths = _filter_existing_var_paths(root_ds, input_path, var_paths)
+    data_vars = {}
+
+    h5_file = _open_h5_file(input_path) if memmap else None
+
+    try:
+        for var_path in var_paths:
+            nc_var = root_ds[var_path]
+            _tune_var_chunk_cache(nc_var, chunk_cache_bytes)
+            data = None
+            if defer_read:
+                data = indexing.LazilyIndexedArray(_NcVarArray(nc_var))
+            elif h5_file is not None:
+                data = _memmap_nc_var(h5_file, input_path, var_path, nc_var)
+            data_vars[var_path] = _nc_var_to_tuple(nc_var, data=data)
+            if not defer_read:
+                # Read in full; free its cached chunks before the next one
+                _release_var_chunk_cache(nc_var)
+    finally:
+        if h5_file is not None:
+            h5_file.close()
+
+    global_attrs = dict(root_ds.__dict__)
+
+    return xr.Dataset(data_vars, attrs=global_attrs)
+
+
+def _open_remote_file(url: str):
+    """Open a remote file (e.g. ``s3://`` or ``https://``) through fsspec.
+
+    The returned file object fetches byte ranges on demand, so only the
+    metadata and the chunks of variables that are read get transferred.
+    """
+    try:
+        import fsspec
+    except ImportError as e:
+        raise ImportError(
+            "Reading remote files requires the 'fsspec' package."
+        ) from e
+
+    return fsspec.open(url, mode="rb").open()
+
+
+def _extract_netcdf_lazy(
+    input_path: str,
+    var_paths: list[str],
+    chunks: int | str | dict | None = None,
+    engine: str = "netcdf4",
+) -> xr.Dataset:
+    """Extract variables lazily through xarray, one store per group.
+
+    The file is opened once and the handle is shared by an xarray store
+    for each group that holds a requested variable, so neither the file
+    nor a group is opened more than once. Values stay on disk until they
+    are loaded or written; the handle stays open until the returned
+    dataset is closed (``close()`` or a ``with`` block) or garbage
+    collected. CF decoding is disabled so values and attributes match the
+    eager netCDF4 path.
+    """
+    remote_file = None
+
+    if engine == "netcdf4":
+        root_ds = nc.Dataset(input_path, "r")
+        global_attrs = dict(root_ds.__dict__)
+        store_cls = xr.backends.NetCDF4DataStore
+    elif engine == "h5netcdf":
+        try:
+            import h5netcdf
+        except ImportError as e:
+            raise ImportError(
+                "engine='h5netcdf' requires the 'h5netcdf' package."
+            ) from e
+        if is_remote_path(input_path):
+            remote_file = _open_remote_file(input_path)
+            root_ds = h5netcdf.File(remote_file, "r")
+        else:
+            root_ds = h5netcdf.File(input_path, "r")
+        global_attrs = dict(root_ds.attrs)
+        store_cls = xr.backends.H5NetCDFStore
+    else:
+        raise ValueError(
+            f"Unsupported engine: {engine}. "
+            f"Valid options: ['netcdf4', 'h5netcdf']"
+        )
+
+    def close():
+        root_ds.close()
+        if remote_file is not None:
+            remote_file.close()
+
+    try:
+        grouped = defaultdict(list)
+        for var_path in _filter_existing_var_paths(
+            root_ds, input_path, var_paths
+        ):
+            group_path, _, var_name = var_path.rpartition("/")
+            grouped[group_path].append((var_path, var_name))
+
+        data_vars = {}
+        for group_path, group_vars in grouped.items():
+            store = store_cls(root_ds, group=group_path or None)
+            group_ds = xr.open_dataset(store, chunks=chunks, decode_cf=False)
+            for var_path, var_name in group_vars:
+                data_vars[var_path] = group_ds.variables[var_name]
+    except BaseException:
+        close()
+        raise
+
+    dataset = xr.Dataset(data_vars, attrs=global_attrs)
+    dataset.set_close(close)
+    return dataset
+
+
 @handle_file_errors
 def extract_netcdf_as_dataset(
-    input_path: str, var_paths: list[str]
+    input_path: str,
+    var_paths: list[str],
+    chunk_cache_bytes: int | None = None,
+    memmap: bool = False,
+    lazy: bool = False,
+    chunks: int | str | dict | None = None,
+    engine: str = "netcdf4",
 ) -> xr.Dataset:
     """Extract variables using netCDF4, return as flat xarray Dataset.
 
@@ -153,28 +520,61 @@ def extract_netcdf_as_dataset(
         Path to netCDF file.
     var_paths : list[str]
         List of variable paths to extract (e.g., ["PRODUCT/latitude"]).
+    chunk_cache_bytes : int, optional
+        HDF5 chunk cache size in bytes for each chunked variable read. If
+        None, sized to hold one row of the variable's chunks (up to
+        ``NETCDF_CHUNK_CACHE_MAX_BYTES``). Ignored when ``lazy`` is True.
+    memmap : bool, default False
+        If True and ``h5py`` is installed, memory-map contiguous,
+        uncompressed variables directly from the file instead of copying
+        them through netCDF4. Mapped arrays are read-only. Other variables
+        are read as usual. Ignored when ``lazy`` is True.
+    lazy : bool, default False
+        If True, open the file once, read each group through
+        :func:`xarray.open_dataset` and return lazily loaded variables
+        instead of reading all values now. Useful when only part of the
+        data is needed downstream, or, with ``chunks``, to write files
+        larger than memory chunk by chunk. The file stays open until the
+        returned dataset is closed, e.g. by using it in a ``with`` block.
+    chunks : int, str, dict or None, default None
+        Passed to :func:`xarray.open_dataset` when ``lazy`` is True. Use
+        ``{}`` to follow the file's native chunking or ``"auto"`` for
+        Dask-backed arrays (requires ``dask``). None keeps xarray's lazy
+        loading without Dask.
+    engine : str, default 'netcdf4'
+        Library used to open the file when ``lazy`` is True: 'netcdf4' or
+        'h5netcdf'. 'h5netcdf' (requires ``h5netcdf``) reads netCDF-4 files
+        through h5py, which is often faster to open for files with many
+        groups and variables. Values are returned raw either way.
+        With 'h5netcdf', ``input_path`` may also be a remote URL such as
+        ``s3://...`` or ``https://...`` (requires ``fsspec`` and the
+        filesystem's own dependencies); only the metadata and the chunks
+        that are read are downloaded.
 
     Returns
     -------
     xr.Dataset
         Dataset containing extracted variables.
     """
-    data_vars = {}
+    if is_remote_path(input_path) and not (lazy and engine == "h5netcdf"):
+        raise ValueError(
+            "Remote files can only be read with lazy=True and "
+            "engine='h5netcdf'."
+        )
 
-    with nc.Dataset(input_path, "r") as root_ds:
-        for var_path in var_paths:
-            try:
-                nc_var = root_ds[var_path]
-                da = convert_nc_var_to_dataarray(
-                    nc_var=nc_var,
-                    var_path=var_path,
-                )
-                data_vars[da.name] = da
-            except KeyError:
-                warnings.warn(
-                    f"Variable '{var_path}' not found in {input_path}"
-                )
-
-        global_attrs = {k: root_ds.getncattr(k) for k in root_ds.ncattrs()}
+    if lazy:
+        return _extract_netcdf_lazy(
+            input_path=input_path,
+            var_paths=var_paths,
+            chunks=chunks,
+            engine=engine,
+        )
 
-    return xr.Dataset(data_vars, attrs=global_attrs)
+    with nc.Dataset(input_path, "r") as root_ds:
+        return _extract_nc_vars(
+            root_ds=root_ds,
+            input_path=input_path,
+            var_paths=var_paths,
+            chunk_cache_bytes=chunk_cache_bytes,
+            memmap=memmap,
+        )
@@ -1,49 +1,50 @@
 """Subsetting netCDF files."""
 
+import hashlib
+import json
 import os
 
-from .read import list_netcdf_vars, extract_netcdf_as_dataset
-from .write import rename_dataset_vars, write_netcdf
+import netCDF4 as nc
+import numpy as np
+
+from .read import (
+    _collect_netcdf_var_paths,
+    _extract_nc_vars,
+    _open_h5_file,
+    _open_netcdf,
+)
+from .write import (
+    _is_compressible,
+    pack_dataset_vars,
+    rename_dataset_vars,
+    write_netcdf,
+)
 from ...utils.constants import DEFAULT_NETCDF_COMPLEVEL
 from ...utils.io import build_subset_path
 from ...utils.parallel import process_files_parallel
 
 
-def _subset_netcdf_single(
+def _select_var_paths(
     nc_input: str,
-    output_dir: str | None = None,
+    all_vars: list[str],
     keep_vars: list[str] | None = None,
     drop_vars: list[str] | None = None,
-    output_name: str | None = None,
-    use_input_name: bool = False,
-    suffix: str = "_SUB",
-    var_renames: dict[str, str] | None = None,
-    compression: str | None = "zlib",
-    complevel: int = DEFAULT_NETCDF_COMPLEVEL,
-    shuffle: bool = True,
-    fletcher32: bool = False,
-    **kwargs,
-) -> None:
-    """Subset one netCDF file and write the output to a new file."""
-
-    if keep_vars is not None and drop_vars is not None:
-        raise ValueError(
-            "Cannot specify both 'keep_vars' and 'drop_vars'. "
-            "Use one or the other."
-        )
+) -> list[str]:
+    """Validate the variable selection against the file's variables."""
 
-    all_vars = list_netcdf_vars(nc_input)
+    available = set(all_vars)
 
     if keep_vars is not None:
         var_paths = keep_vars
-        missing = [v for v in keep_vars if v not in all_vars]
+        missing = [v for v in keep_vars if v not in available]
         if missing:
             raise ValueError(
                 f"Variables not found in {nc_input}: {missing}"
             )
     elif drop_vars is not None:
-        var_paths = [v for v in all_vars if v not in drop_vars]
-        missing = [v for v in drop_vars if v not in all_vars]
+        dropped = set(drop_vars)
+        var_paths = [v for v in all_vars if v not in dropped]
+        missing = [v for v in drop_vars if v not in available]
         if missing:
             raise ValueError(
                 f"Variables not found in {nc_input}: {missing}"
@@ -53,17 +54,18 @@ def _subset_netcdf_single(
             "Either 'keep_vars' or 'drop_vars' must be specified."
         )
 
-    subset_ds = extract_netcdf_as_dataset(
-        input_path=nc_input,
-        var_paths=var_paths,
-    )
+    return var_paths
 
-    if var_renames:
-        subset_ds = rename_dataset_vars(
-            dataset=subset_ds,
-            var_renames=var_renames,
-        )
 
+def _subset_output_path(
+    nc_input: str,
+    output_dir: str | None,
+    output_name: str | None,
+    use_input_name: bool,
+    suffix: str,
+    output_format: str | None,
+) -> str:
+    """Return the output path for one subset file."""
     output_path = build_subset_path(
         input_path=nc_input,
         output_dir=output_dir,
@@ -71,16 +73,355 @@ def _subset_netcdf_single(
         use_input_name=use_input_name,
         suffix=suffix,
     )
+    if output_format == "zarr" and not output_name:
+        output_path = os.path.splitext(output_path)[0] + ".zarr"
+    return output_path
 
-    write_netcdf(
-        dataset=subset_ds,
-        output_path=output_path,
-        compression=compression,
-        complevel=complevel,
-        shuffle=shuffle,
-        fletcher32=fletcher32,
-        **kwargs,
+
+def _subset_key(nc_input: str, settings: dict) -> str:
+    """Hash the input file's identity and the subset settings.
+
+    The input is identified by its absolute path, size and modification
+    time, so an edited or replaced input gives a new key.
+    """
+    stat = os.stat(nc_input)
+    raw = repr((
+        os.path.abspath(nc_input),
+        stat.st_size,
+        stat.st_mtime_ns,
+        sorted(settings.items()),
+    ))
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def _subset_meta_path(output_path: str) -> str:
+    """Return the path of the sidecar file recording an output's key."""
+    return f"{output_path}.meta.json"
+
+
+def _is_subset_current(output_path: str, key: str) -> bool:
+    """Return True if ``output_path`` exists and was written with ``key``."""
+    if not os.path.exists(output_path):
+        return False
+    try:
+        with open(_subset_meta_path(output_path)) as f:
+            return json.load(f).get("key") == key
+    except (OSError, ValueError):
+        return False
+
+
+# HDF5 filter ids, in the order netCDF-C applies them
+_H5Z_FILTER_DEFLATE = 1
+_H5Z_FILTER_SHUFFLE = 2
+_H5Z_FILTER_FLETCHER32 = 3
+
+
+def _expected_filters(
+    compressed: bool, complevel: int, shuffle: bool, fletcher32: bool,
+) -> list[tuple[int, tuple]]:
+    """Return the zlib filter pipeline write_netcdf would give a variable."""
+    if not compressed:
+        return []
+    pipeline = []
+    if fletcher32:
+        pipeline.append((_H5Z_FILTER_FLETCHER32, ()))
+    if shuffle:
+        pipeline.append((_H5Z_FILTER_SHUFFLE, None))
+    pipeline.append((_H5Z_FILTER_DEFLATE, (complevel,)))
+    return pipeline
+
+
+def _is_raw_copyable(
+    nc_var: nc.Variable,
+    h5_file,
+    var_path: str,
+    compressed: bool,
+    complevel: int,
+    shuffle: bool,
+    fletcher32: bool,
+    unlimited_dims=(),
+) -> bool:
+    """Return True if a variable's stored chunks can be copied verbatim.
+
+    That is the case when the variable is chunked, has a plain numeric or
+    character type, and its filter pipeline is exactly the one the output
+    would get, so decoding and re-encoding would give the same bytes back.
+    Its dimensions must also be unlimited exactly when they will be in the
+    output (``unlimited_dims``), since the other variables' writes may
+    create them first.
+    """
+    if (
+        not isinstance(nc_var.datatype, np.dtype)
+        or nc_var.dtype.fields is not None
+        or not isinstance(nc_var.chunking(), list)
+    ):
+        return False
+
+    # netCDF-C stores a variable named like a dimension it does not use
+    # under another HDF5 name
+    name = nc_var.name
+    if name in nc_var.group().dimensions and nc_var.dimensions != (name,):
+        return False
+
+    # Dimensions written by xarray are unlimited only if listed in
+    # unlimited_dims, and a chunk cannot be larger than a fixed dimension
+    for dim, chunk in zip(nc_var.get_dims(), nc_var.chunking()):
+        if dim.isunlimited() != (dim.name in unlimited_dims):
+            return False
+        if not dim.isunlimited() and chunk > len(dim):
+            return False
+
+    try:
+        dset = h5_file[var_path]
+    except KeyError:
+        return False
+    if dset.chunks != tuple(nc_var.chunking()):
+        return False
+
+    plist = dset.id.get_create_plist()
+    filters = [plist.get_filter(i) for i in range(plist.get_nfilters())]
+    expected = _expected_filters(compressed, complevel, shuffle, fletcher32)
+    if len(filters) != len(expected):
+        return False
+    for (filter_id, _, values, _), (expected_id, expected_values) in zip(
+        filters, expected
+    ):
+        if filter_id != expected_id:
+            return False
+        if expected_values is not None and tuple(values) != expected_values:
+            return False
+    return True
+
+
+def _define_like(root_grp: nc.Dataset, nc_var: nc.Variable, var_path: str):
+    """Define a variable like ``nc_var`` in the output, without data.
+
+    Missing dimensions are created in the same group as in the input.
+    """
+    for dim in nc_var.get_dims():
+        dim_path = dim.group().path.strip("/")
+        dim_grp = root_grp.createGroup(dim_path) if dim_path else root_grp
+        if dim.name not in dim_grp.dimensions:
+            dim_grp.createDimension(
+                dim.name, None if dim.isunlimited() else len(dim)
+            )
+
+    group_path, _, name = var_path.rpartition("/")
+    grp = root_grp.createGroup(group_path) if group_path else root_grp
+    filters = nc_var.filters()
+    attrs = {k: nc_var.getncattr(k) for k in nc_var.ncattrs()}
+    # xarray gives float variables without a fill value _FillValue=NaN
+    if nc_var.dtype.kind == "f":
+        attrs.setdefault("_FillValue", np.nan)
+    out_var = grp.createVariable(
+        name,
+        nc_var.datatype,
+        nc_var.dimensions,
+        compression="zlib" if filters["zlib"] else None,
+        complevel=filters["complevel"],
+        shuffle=filters["shuffle"],
+        fletcher32=filters["fletcher32"],
+        chunksizes=nc_var.chunking(),
+        endian=nc_var.endian(),
+        fill_value=attrs.pop("_FillValue", None),
     )
+    out_var.setncatts(attrs)
+
+
+def _copy_raw_chunks(src_dset, dst_dset) -> None:
+    """Copy the stored (still compressed) chunks of one HDF5 dataset."""
+    if dst_dset.shape != src_dset.shape:
+        dst_dset.resize(src_dset.shape)
+
+    def copy_chunk(info):
+        filter_mask, data = src_dset.id.read_direct_chunk(info.chunk_offset)
+        dst_dset.id.write_direct_chunk(info.chunk_offset, data, filter_mask)
+
+    # chunk_iter visits the chunk index once; get_chunk_info(i) searches it
+    # again for every chunk
+    if hasattr(src_dset.id, "chunk_iter"):
+        src_dset.id.chunk_iter(copy_chunk)
+    else:
+        for i in range(src_dset.id.get_num_chunks()):
+            copy_chunk(src_dset.id.get_chunk_info(i))
+
+
+def _copy_raw_vars(
+    root_ds: nc.Dataset, h5_file, output_path: str, var_paths: list[str],
+) -> None:
+    """Add variables to a written output by copying their stored chunks.
+
+    The variables are defined through netCDF4, so the output stays a
+    valid netCDF file, and their chunks are then copied with h5py.
+    """
+    import h5py
+
+    with nc.Dataset(output_path, "a") as root_grp:
+        for var_path in var_paths:
+            _define_like(root_grp, root_ds[var_path], var_path)
+
+    with h5py.File(output_path, "r+") as h5_out:
+        for var_path in var_paths:
+            _copy_raw_chunks(h5_file[var_path], h5_out[var_path])
+
+
+def _subset_netcdf_single(
+    nc_input: str,
+    output_dir: str | None = None,
+    keep_vars: list[str] | None = None,
+    drop_vars: list[str] | None = None,
+    output_name: str | None = None,
+    use_input_name: bool = False,
+    suffix: str = "_SUB",
+    var_renames: dict[str, str] | None = None,
+    pack_vars: list[str] | None = None,
+    compression: str | None = "zlib",
+    complevel: int = DEFAULT_NETCDF_COMPLEVEL,
+    shuffle: bool = True,
+    fletcher32: bool = False,
+    skip_existing: bool = False,
+    copy_raw_chunks: bool = False,
+    **kwargs,
+) -> None:
+    """Subset one netCDF file and write the output to a new file."""
+
+    if keep_vars is not None and drop_vars is not None:
+        raise ValueError(
+            "Cannot specify both 'keep_vars' and 'drop_vars'. "
+            "Use one or the other."
+        )
+
+    if skip_existing:
+        output_path = _subset_output_path(
+            nc_input=nc_input,
+            output_dir=output_dir,
+            output_name=output_name,
+            use_input_name=use_input_name,
+            suffix=suffix,
+            output_format=kwargs.get("output_format"),
+        )
+        key = _subset_key(nc_input, {
+            "keep_vars": keep_vars,
+            "drop_vars": drop_vars,
+            "var_renames": var_renames,
+            "pack_vars": pack_vars,
+            "compression": compression,
+            "complevel": complevel,
+            "shuffle": shuffle,
+            "fletcher32": fletcher32,
+            "copy_raw_chunks": copy_raw_chunks,
+            **kwargs,
+        })
+        if _is_subset_current(output_path, key):
+            return
+
+    # Stream from input to output: variables are read lazily from the open
+    # input and written one at a time, so only one is held in memory.
+    with _open_netcdf(nc_input) as root_ds:
+        var_paths = _select_var_paths(
+            nc_input=nc_input,
+            all_vars=_collect_netcdf_var_paths(root_ds),
+            keep_vars=keep_vars,
+            drop_vars=drop_vars,
+        )
+
+        subset_ds = _extract_nc_vars(
+            root_ds=root_ds,
+            input_path=nc_input,
+            var_paths=var_paths,
+            defer_read=True,
+            # Already checked against the file by _select_var_paths
+            check_paths=False,
+        )
+
+        # Variables already stored exactly as they would be written are
+        # copied chunk by chunk afterwards, skipping decompression and
+        # recompression. Needs h5py and plain netCDF-4 output.
+        raw_paths = []
+        h5_file = None
+        if (
+            copy_raw_chunks
+            and not var_renames
+            and compression in ("zlib", None)
+            and kwargs.get("output_format", "netcdf") == "netcdf"
+            and kwargs.get("format", "NETCDF4") == "NETCDF4"
+            and kwargs.get("compute", True)
+            and not kwargs.get("adaptive_complevel")
+            and kwargs.get("mode", "w") == "w"
+            and not kwargs.get("group")
+            and not kwargs.get("encoding")
+        ):
+            h5_file = _open_h5_file(nc_input)
+        if h5_file is not None:
+            raw_paths = [
+                var_path for var_path in subset_ds.data_vars
+                if var_path not in (pack_vars or ())
+                and _is_raw_copyable(
+                    nc_var=root_ds[var_path],
+                    h5_file=h5_file,
+                    var_path=var_path,
+                    compressed=(
+                        compression is not None
+                        and _is_compressible(subset_ds[var_path])
+                    ),
+                    complevel=complevel,
+                    shuffle=shuffle,
+                    fletcher32=fletcher32,
+                    unlimited_dims=kwargs.get("unlimited_dims") or (),
+                )
+            ]
+            subset_ds = subset_ds.drop_vars(raw_paths)
+
+        if pack_vars:
+            subset_ds = pack_dataset_vars(
+                dataset=subset_ds,
+                var_names=pack_vars,
+            )
+
+        if var_renames:
+            subset_ds = rename_dataset_vars(
+                dataset=subset_ds,
+                var_renames=var_renames,
+            )
+
+        output_path = _subset_output_path(
+            nc_input=nc_input,
+            output_dir=output_dir,
+            output_name=output_name,
+            use_input_name=use_input_name,
+            suffix=suffix,
+            output_format=kwargs.get("output_format"),
+        )
+
+        # A recorded key no longer describes the output once it is rewritten
+        meta_path = _subset_meta_path(output_path)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        try:
+            write_netcdf(
+                dataset=subset_ds,
+                output_path=output_path,
+                compression=compression,
+                complevel=complevel,
+                shuffle=shuffle,
+                fletcher32=fletcher32,
+                **kwargs,
+            )
+            if raw_paths:
+                try:
+                    _copy_raw_vars(root_ds, h5_file, output_path, raw_paths)
+                except BaseException:
+                    # Do not leave a half-written output behind
+                    os.remove(output_path)
+                    raise
+        finally:
+            if h5_file is not None:
+                h5_file.close()
+
+    if skip_existing:
+        with open(meta_path, "w") as f:
+            json.dump({"input": os.path.abspath(nc_input), "key": key}, f)
 
 
 def subset_netcdf(
@@ -92,10 +433,13 @@ def subset_netcdf(
     use_input_name: bool = False,
     suffix: str = "_SUB",
     var_renames: dict[str, str] | None = None,
+    pack_vars: list[str] | None = None,
     compression: str | None = "zlib",
     complevel: int = DEFAULT_NETCDF_COMPLEVEL,
     shuffle: bool = True,
     fletcher32: bool = False,
+    skip_existing: bool = False,
+    copy_raw_chunks: bool = False,
     workers: int | None = None,
     show_progress: bool = True,
     **kwargs,
@@ -131,11 +475,31 @@ def subset_netcdf(
         Suffix for generated output names.
     var_renames : dict[str, str], optional
         Rename variables before write.
+    pack_vars : list[str], optional
+        Float variables (input paths) to store as int16 with
+        ``scale_factor``/``add_offset``; lossy, see
+        :func:`~envdataprep.core.netcdf.write.pack_dataset_vars`.
     compression : str or None, default 'zlib'
-        Passed to :func:`~envdataprep.core.netcdf.write.write_netcdf`.
+        'zlib', 'zstd', 'blosc_zstd', 'blosc_lz4' or None. Passed to
+        :func:`~envdataprep.core.netcdf.write.write_netcdf`.
     complevel : int, default from constants
     shuffle, fletcher32
         Compression options for writing.
+    skip_existing : bool, default False
+        Skip inputs whose output already exists and was written from the
+        same, unchanged input with the same settings. A small
+        ``<output>.meta.json`` file next to each output records this, so
+        re-running over a partly processed directory only processes new or
+        changed files.
+    copy_raw_chunks : bool, default False
+        Copy variables whose stored compression already matches the
+        requested one chunk by chunk, without decompressing and
+        recompressing them; much faster for large variables. Needs h5py,
+        'zlib' or None compression, netCDF-4 output and no
+        ``var_renames``; other variables are written as usual. Copied
+        variables keep the input's chunk sizes and are added after the
+        others, so the output can differ from a normal write in chunking
+        and variable order, but not in values or attributes.
     workers : int, optional
         For a list of inputs only: if ``None`` or ``1``, run sequentially; if an
         integer ``> 1``, use that many worker processes.
@@ -143,6 +507,8 @@ def subset_netcdf(
         For a list with ``workers > 1`` only: tqdm over parallel tasks.
     **kwargs
         Extra arguments to :func:`~envdataprep.core.netcdf.write.write_netcdf`.
+        With ``output_format="zarr"``, generated output names end in
+        ``.zarr`` instead of the input extension.
 
     Raises
     ------
@@ -157,10 +523,13 @@ def subset_netcdf(
         "use_input_name": use_input_name,
         "suffix": suffix,
         "var_renames": var_renames,
+        "pack_vars": pack_vars,
         "compression": compression,
         "complevel": complevel,
         "shuffle": shuffle,
         "fletcher32": fletcher32,
+        "skip_existing": skip_existing,
+        "copy_raw_chunks": copy_raw_chunks,
         **kwargs,
     }
 
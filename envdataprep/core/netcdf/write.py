@@ -1,11 +1,27 @@
 """Writing and encoding functions for netCDF files."""
 
 import os
+import zlib
 from collections import defaultdict
 
+import netCDF4 as nc
+import numpy as np
 import xarray as xr
-
-from ...utils.constants import DEFAULT_NETCDF_COMPLEVEL
+from xarray.backends.common import ArrayWriter
+from xarray.backends.locks import (
+    HDF5_LOCK,
+    NETCDFC_LOCK,
+    combine_locks,
+    get_write_lock,
+)
+
+from .read import _release_var_chunk_cache
+from ...utils.constants import (
+    DEFAULT_NETCDF_COMPLEVEL,
+    NETCDF_ADAPTIVE_FAST_RATIO,
+    NETCDF_ADAPTIVE_SKIP_RATIO,
+    NETCDF_WRITE_CHUNK_BYTES,
+)
 
 
 def rename_dataset_vars(
@@ -30,9 +46,107 @@ def rename_dataset_vars(
     return dataset
 
 
-def _create_group_mapping(var_names: list[str]) -> dict[str, list[str]]:
+def pack_dataset_vars(
+    dataset: xr.Dataset, var_names: list[str], dtype: str = "int16",
+) -> xr.Dataset:
+    """Set float variables to be stored as scaled integers when written.
+
+    Each variable's valid range is mapped linearly onto the integer type,
+    and ``scale_factor``/``add_offset`` are written so that CF readers
+    (e.g. xarray) unpack the values again. This is lossy: values keep
+    about ``(max - min) / 65532`` precision with 'int16'. Missing values
+    (NaN or the variable's ``_FillValue``) become the integer type's
+    minimum, which is written as the new ``_FillValue``. The variables are
+    loaded into memory.
+
+    Parameters
+    ----------
+    dataset : xr.Dataset
+        Dataset holding the variables.
+    var_names : list[str]
+        Float variables to pack.
+    dtype : str, default "int16"
+        Signed integer type to store the variables as ('int8', 'int16'
+        or 'int32').
+
+    Returns
+    -------
+    xr.Dataset
+        Dataset whose packed variables carry the packing in their encoding.
+
+    Raises
+    ------
+    ValueError
+        Unsupported ``dtype``, missing, non-float or already packed
+        variables.
+    """
+    if dtype not in ("int8", "int16", "int32"):
+        raise ValueError(
+            f"Unsupported dtype: {dtype}. "
+            f"Valid options: ['int8', 'int16', 'int32']"
+        )
+    missing = [name for name in var_names if name not in dataset]
+    if missing:
+        raise ValueError(f"Variables not found in dataset: {missing}")
+
+    int_info = np.iinfo(dtype)
+
+    dataset = dataset.copy()
+    for name in var_names:
+        var = dataset[name]
+        if var.dtype.kind != "f":
+            raise ValueError(f"Only float variables can be packed: {name}")
+        if "scale_factor" in var.attrs or "add_offset" in var.attrs:
+            raise ValueError(f"Variable is already packed: {name}")
+
+        attrs = dict(var.attrs)
+        fill_value = attrs.pop("_FillValue", var.encoding.get("_FillValue"))
+        values = var.values
+        if fill_value is not None and not np.isnan(fill_value):
+            values = np.where(values == fill_value, np.nan, values)
+
+        # The type's minimum is kept free for missing values, and one more
+        # step is left spare at each end for rounding in the float encoding.
+        # Codes also stay within the integers the float type holds exactly
+        # (2**24 for float32 packed into int32).
+        exact = 2 ** (np.finfo(var.dtype).nmant + 1)
+        lowest = max(int(int_info.min) + 2, -exact)
+        highest = min(int(int_info.max) - 1, exact)
+
+        valid = values[~np.isnan(values)]
+        vmin = float(valid.min()) if valid.size else 0.0
+        vmax = float(valid.max()) if valid.size else 0.0
+        # scale_factor and add_offset are stored in the variable's float
+        # type. add_offset is rounded first and scale_factor is worked out
+        # from the rounded value, so that the range still fits the type
+        # even when rounding moves add_offset by more than a step.
+        float_type = var.dtype.type
+        add_offset = float_type((vmin + vmax) / 2)
+        scale_factor = float_type(max(
+            (float(add_offset) - vmin) / -lowest,
+            (vmax - float(add_offset)) / highest,
+        ) or 1.0)
+
+        dataset[name] = var.copy(data=values)
+        dataset[name].attrs = attrs
+        dataset[name].encoding = {
+            **{k: v for k, v in var.encoding.items() if k != "_FillValue"},
+            "dtype": dtype,
+            "scale_factor": scale_factor,
+            "add_offset": add_offset,
+            "_FillValue": int_info.min,
+        }
+    return dataset
+
+
+def _create_group_mapping(
+    var_names: list[str],
+) -> dict[str, list[tuple[str, str]]]:
     """Create mapping of group paths to variable names for hierarchical writing.
 
+    Each name is split once; the short name is kept next to the full one
+    so that later steps do not parse the path again.
+
     Parameters
     ----------
     var_names : list[str]
@@ -40,76 +154,113 @@ def _create_group_mapping(var_names: list[str]) -> dict[str, list[str]]:
 
     Returns
     -------
-    dict[str, list[str]]
-        Mapping of {group_path: [var_names, ...]}.
+    dict[str, list[tuple[str, str]]]
+        Mapping of {group_path: [(full_name, short_name), ...]}, e.g.
+        {"PRODUCT": [("PRODUCT/latitude", "latitude")]}.
         Empty string key represents root group.
     """
     groups = defaultdict(list)
 
     for var_name in var_names:
-        if "/" in var_name:
-            group_path, _ = var_name.rsplit("/", 1)
-        else:
-            group_path = ""
-        groups[group_path].append(var_name)
+        # rpartition gives an empty head for root-level names
+        group_path, _, short_name = var_name.rpartition("/")
+        groups[group_path].append((var_name, short_name))
 
     return dict(groups)
 
 
-def _clean_group_var_names(
-    dataset: xr.Dataset, group_path: str
-) -> xr.Dataset:
-    """Remove group prefix from variable names for netCDF group writing.
+def _split_group_dataset(dataset: xr.Dataset) -> list[xr.Dataset]:
+    """Split a group dataset into parts that are encoded and written in turn.
 
-    Transforms "PRODUCT/latitude" -> "latitude" when writing to PRODUCT group.
+    xarray encodes every variable of a dataset before writing any of them,
+    which loads all lazily read variables at once. Writing one variable per
+    part (in the dataset's order) keeps only one in memory; the attributes
+    follow as a final part. Groups with non-index coordinates are written
+    in one go, since splitting would drop their ``coordinates`` links.
+    """
+    if any(name not in dataset.dims for name in dataset.coords):
+        return [dataset]
 
-    Parameters
-    ----------
-    dataset : xr.Dataset
-        Dataset with potentially prefixed variable names.
-    group_path : str
-        Group path prefix to remove (e.g., "PRODUCT").
+    parts = [
+        xr.Dataset({name: var}) for name, var in dataset.variables.items()
+    ]
+    parts.append(xr.Dataset(attrs=dataset.attrs))
+    return parts
 
-    Returns
-    -------
-    xr.Dataset
-        Dataset with cleaned variable names.
+
+def _is_compressible(var: xr.DataArray) -> bool:
+    """Return True for numeric variables larger than 1KB."""
+    return var.dtype.kind in ("f", "i", "u") and var.nbytes > 1024
+
+
+def _iter_group_datasets(dataset: xr.Dataset):
+    """Yield ``(group_path, group_dataset)`` pairs in write order.
+
+    Variables are grouped by the path before their last "/", and the
+    prefix is stripped from their names; each name is split only once.
+    The root group always comes first and carries the global attributes;
+    every group shares the dataset's coordinates, which are written before
+    the group's own variables.
     """
-    if not group_path:
-        return dataset
-
-    prefix = f"{group_path}/"
-    renamed = {}
-    for name, var in dataset.data_vars.items():
-        if str(name).startswith(prefix):
-            clean = str(name)[len(prefix):]
-        else:
-            clean = name
-        renamed[clean] = var
+    var_names = [str(k) for k in dataset.data_vars.keys()]
+    group_map = _create_group_mapping(var_names)
 
-    return xr.Dataset(renamed, coords=dataset.coords, attrs=dataset.attrs)
+    # Ensure root group exists to preserve global attributes
+    if "" not in group_map:
+        group_map[""] = []
 
+    # Write root group first (empty string sorts first)
+    sorted_groups = sorted(group_map.items(), key=lambda x: (x[0] != "", x[0]))
 
-def _create_encoding(
-    dataset: xr.Dataset,
+    for group_path, group_names in sorted_groups:
+        # Plain variables carry no coordinates of their own, so the short
+        # names cannot clash with those of the full-name DataArrays
+        group_vars = {
+            short_name: dataset.variables[full_name]
+            for full_name, short_name in group_names
+        }
+        group_attrs = dataset.attrs if group_path == "" else {}
+
+        # A group variable named like a root coordinate (e.g. "PRODUCT/row"
+        # next to "row") replaces it in the group
+        coords = dataset.coords
+        shadowed = [name for name in coords if name in group_vars]
+        if group_path and shadowed:
+            coords = coords.to_dataset().drop_vars(shadowed).coords
+
+        # Coordinates first, so they are also written first
+        sub_ds = xr.Dataset(coords=coords, attrs=group_attrs)
+        yield group_path, sub_ds.assign(group_vars)
+
+
+def _compression_encoding(
     compression: str | None = "zlib",
     complevel: int = DEFAULT_NETCDF_COMPLEVEL,
     shuffle: bool = True,
     fletcher32: bool = False,
-) -> dict:
-    """Create encoding dictionary for netCDF output.
+) -> dict | None:
+    """Validate compression options and build the netCDF variable encoding.
 
-    Only compresses numeric variables larger than 1KB to avoid
-    encoding conflicts.
+    Returns None when compression is disabled.
     """
     if compression is None:
-        return {}
+        return None
 
-    # Currently only zlib is supported;
-    # other algorithms (gzip, szip, lzf)
-    # produced errors in testing.
+    # Other algorithms (gzip, szip, lzf) produced errors in testing.
+    # zstd and blosc need netCDF4>=1.6 built against libnetcdf>=4.9 with
+    # the filter plugins available. netCDF4 only applies the HDF5 shuffle
+    # filter together with zlib; blosc runs its own byte shuffle.
     comp_configs = {
         "zlib": lambda level: {"zlib": True, "complevel": level},
+        "zstd": lambda level: {"compression": "zstd", "complevel": level},
+        "blosc_zstd": lambda level: {
+            "compression": "blosc_zstd", "complevel": level,
+            "blosc_shuffle": int(shuffle),
+        },
+        "blosc_lz4": lambda level: {
+            "compression": "blosc_lz4", "complevel": level,
+            "blosc_shuffle": int(shuffle),
+        },
     }
 
     if compression not in comp_configs:
@@ -118,19 +269,282 @@ def _create_encoding(
             f"Valid options: {list(comp_configs.keys())}"
         )
 
+    support_flag = (
+        "__has_blosc_support__" if compression.startswith("blosc")
+        else "__has_zstandard_support__" if compression == "zstd"
+        else None
+    )
+    if support_flag and not getattr(nc, support_flag, False):
+        raise ValueError(
+            f"{compression} compression is not available in this netCDF4 build."
+        )
+
+    return {
+        **comp_configs[compression](complevel),
+        "shuffle": shuffle,
+        "fletcher32": fletcher32,
+    }
+
+
+def _zarr_compression_encoding(
+    compression: str | None = "zlib",
+    complevel: int = DEFAULT_NETCDF_COMPLEVEL,
+    shuffle: bool = True,
+) -> dict | None:
+    """Validate compression options and build the zarr variable encoding.
+
+    Uses a Blosc compressor running the requested codec (zarr's own codec
+    for zarr>=3, ``numcodecs`` for zarr 2). Returns None when compression
+    is disabled.
+    """
+    if compression is None:
+        return None
+
+    # Blosc runs every codec here, so "blosc_zstd" is the same as "zstd"
+    cnames = {
+        "zlib": "zlib",
+        "zstd": "zstd",
+        "blosc_zstd": "zstd",
+        "blosc_lz4": "lz4",
+    }
+    if compression not in cnames:
+        raise ValueError(
+            f"Unsupported compression: {compression}. "
+            f"Valid options: {list(cnames.keys())}"
+        )
+    cname = cnames[compression]
+
+    if not 0 <= complevel <= 9:
+        raise ValueError(
+            f"complevel must be between 0 and 9 for zarr output, got {complevel}."
+        )
+
+    import zarr
+
+    if int(zarr.__version__.split(".")[0]) >= 3:
+        return {
+            "compressors": (
+                zarr.codecs.BloscCodec(
+                    cname=cname,
+                    clevel=complevel,
+                    shuffle="shuffle" if shuffle else "noshuffle",
+                ),
+            ),
+        }
+
+    from numcodecs import Blosc
+
+    return {
+        "compressor": Blosc(
+            cname=cname,
+            clevel=complevel,
+            shuffle=Blosc.SHUFFLE if shuffle else Blosc.NOSHUFFLE,
+        ),
+    }
+
+
+def _auto_chunksizes(var: xr.DataArray) -> tuple[int, ...]:
+    """Choose chunk sizes of about ``NETCDF_WRITE_CHUNK_BYTES`` for a variable.
+
+    Chunks keep the fastest-varying (last) dimensions whole while the byte
+    budget allows and split the slowest ones, so a chunk holds complete
+    rows. With one chunk for a whole compressed variable, any partial read
+    has to decompress all of it; small chunks keep region and time-step
+    reads proportional to the data touched.
+    """
+    remaining = max(1, NETCDF_WRITE_CHUNK_BYTES // var.dtype.itemsize)
+    chunks = []
+    for size in reversed(var.shape):
+        chunk = max(1, min(size, remaining))
+        chunks.append(chunk)
+        remaining = max(1, remaining // chunk)
+    return tuple(reversed(chunks))
+
+
+# Variable encoding entries that describe how values are stored on disk
+_PACKING_ENCODING_KEYS = ("dtype", "scale_factor", "add_offset", "_FillValue")
+
+
+def _adaptive_complevel(
+    var: xr.DataArray,
+    chunksizes: tuple[int, ...],
+    complevel: int,
+    shuffle: bool,
+) -> int | None:
+    """Pick a zlib level for a variable from a trial run on its first chunk.
+
+    The chunk is compressed once at level 1 (byte-shuffled like the HDF5
+    filter when ``shuffle`` is set). Data that barely compresses is
+    written uncompressed (None), data that compresses moderately at level
+    1, where higher levels cost much more CPU for little gain, and the
+    rest at ``complevel``.
+    """
+    sample = np.ascontiguousarray(
+        var.isel(dict(zip(var.dims, (slice(0, n) for n in chunksizes)))).values
+    )
+    itemsize = sample.dtype.itemsize
+    if shuffle and itemsize > 1:
+        raw = sample.view(np.uint8).reshape(-1, itemsize).T.tobytes()
+    else:
+        raw = sample.tobytes()
+    if not raw:
+        return complevel
+
+    ratio = len(zlib.compress(raw, 1)) / len(raw)
+    if ratio > NETCDF_ADAPTIVE_SKIP_RATIO:
+        return None
+    if ratio > NETCDF_ADAPTIVE_FAST_RATIO:
+        return 1
+    return complevel
+
+
+def _create_encoding(
+    dataset: xr.Dataset,
+    var_enc: dict | None,
+    chunk: bool = False,
+    adaptive: bool = False,
+) -> dict:
+    """Create encoding dictionary for netCDF or zarr output.
+
+    Only compresses numeric variables larger than 1KB to avoid
+    encoding conflicts. ``var_enc`` is built once per write by
+    :func:`_compression_encoding` (or its zarr counterpart) and shared by
+    every variable; xarray copies each variable's encoding before using it.
+    With ``chunk``, each compressed variable keeps the chunk sizes it was
+    read with, or gets ones from :func:`_auto_chunksizes`. With
+    ``adaptive`` (zlib only), each variable's level comes from
+    :func:`_adaptive_complevel`.
+    """
+    if var_enc is None:
+        return {}
+
     encoding = {}
-    config = comp_configs[compression](complevel)
+    for var_name, var in dataset.data_vars.items():
+        if not _is_compressible(var):
+            continue
+        name = str(var_name)
+        if (chunk or adaptive) and var.ndim > 0:
+            chunksizes = var.encoding.get("chunksizes")
+            if chunksizes is None or len(chunksizes) != var.ndim:
+                chunksizes = _auto_chunksizes(var)
+        else:
+            chunksizes = None
+
+        # The encoding given here replaces the variable's own, so CF
+        # packing set on it (see pack_dataset_vars) is carried over
+        packing = {
+            k: var.encoding[k] for k in _PACKING_ENCODING_KEYS
+            if k in var.encoding
+        }
+        var_encoding = {**var_enc, **packing} if packing else var_enc
+        if adaptive:
+            complevel = _adaptive_complevel(
+                var, chunksizes, var_enc["complevel"], var_enc["shuffle"],
+            )
+            if complevel is None:
+                # Written uncompressed and contiguous. The entry is still
+                # needed: without one xarray falls back to the variable's
+                # own encoding, e.g. the compression of the file it was
+                # lazily read from.
+                encoding[name] = {
+                    **packing,
+                    "zlib": False,
+                    "fletcher32": var_enc["fletcher32"],
+                }
+                continue
+            var_encoding = {**var_encoding, "complevel": complevel}
+        if chunk and chunksizes is not None:
+            var_encoding = {**var_encoding, "chunksizes": chunksizes}
+        encoding[name] = var_encoding
+    return encoding
+
 
-    for var_name in dataset.data_vars:
-        var = dataset[var_name]
-        if var.dtype.kind in ("f", "i", "u") and var.nbytes > 1024:
-            var_enc = config.copy()
-            var_enc.update({"shuffle": shuffle, "fletcher32": fletcher32})
-            encoding[str(var_name)] = var_enc
+def _close_after_writes(writes, manager: xr.backends.CachingFileManager) -> None:
+    """Close a netCDF file once its deferred writes (passed in) are done."""
+    manager.close()
 
+
+def _apply_user_encoding(
+    encoding: dict, group_ds: xr.Dataset, group_path: str, user_encoding: dict,
+) -> dict:
+    """Merge user encoding, keyed by full variable name, into a group's.
+
+    Coordinates are shared by all groups and looked up by their own name.
+    """
+    prefix = f"{group_path}/" if group_path else ""
+    for name in group_ds.variables:
+        key = prefix + str(name) if name in group_ds.data_vars else str(name)
+        if key in user_encoding:
+            encoding[str(name)] = {
+                **encoding.get(str(name), {}),
+                **user_encoding[key],
+            }
     return encoding
 
 
+def _consolidate_after_writes(writes, output_path: str) -> None:
+    """Consolidate zarr metadata once the deferred writes are done."""
+    import zarr
+
+    zarr.consolidate_metadata(output_path)
+
+
+def _write_zarr(
+    dataset: xr.Dataset,
+    output_path: str,
+    compression: str | None = "zlib",
+    complevel: int = DEFAULT_NETCDF_COMPLEVEL,
+    shuffle: bool = True,
+    compute: bool = True,
+    mode: str = "w",
+    base_group: str | None = None,
+    user_encoding: dict | None = None,
+):
+    """Write a flat dataset to a zarr store, one zarr group per path prefix.
+
+    Groups are written in the same order as for netCDF output, under
+    ``base_group`` if given. With ``mode`` 'w' the root group replaces any
+    existing store (or ``base_group``); with 'a' the groups are added to
+    it. Metadata is consolidated once at the end so readers can open the
+    store with a single request. With ``compute`` False, returns a Dask
+    delayed object that writes the Dask-backed data and then consolidates.
+    """
+    try:
+        import zarr
+    except ImportError as e:
+        raise ImportError(
+            "Writing zarr output requires the 'zarr' package."
+        ) from e
+
+    var_enc = _zarr_compression_encoding(
+        compression=compression,
+        complevel=complevel,
+        shuffle=shuffle,
+    )
+
+    writes = [
+        sub_ds.to_zarr(
+            output_path,
+            group="/".join(p for p in (base_group, group_path) if p) or None,
+            mode="a" if group_path else mode,
+            encoding=_apply_user_encoding(
+                _create_encoding(sub_ds, var_enc),
+                sub_ds, group_path, user_encoding or {},
+            ),
+            consolidated=False,
+            compute=compute,
+        )
+        for group_path, sub_ds in _iter_group_datasets(dataset)
+    ]
+
+    if not compute:
+        import dask
+
+        return dask.delayed(_consolidate_after_writes)(writes, output_path)
+
+    zarr.consolidate_metadata(output_path)
+
+
 def write_netcdf(
     dataset: xr.Dataset,
     output_path: str,
@@ -138,8 +552,12 @@ def write_netcdf(
     complevel: int = DEFAULT_NETCDF_COMPLEVEL,
     shuffle: bool = True,
     fletcher32: bool = False,
+    output_format: str = "netcdf",
+    adaptive_complevel: bool = False,
+    diskless: bool = False,
+    compute: bool = True,
     **kwargs,
-) -> None:
+):
     """Write xarray Dataset to netCDF file with compression and group structure.
 
     Parameters
@@ -149,59 +567,214 @@ def write_netcdf(
     output_path : str
         Full path for output file (including filename).
     compression : str or None, default 'zlib'
-        Compression algorithm. Currently only 'zlib' is supported.
-        Pass None to disable compression.
+        Compression algorithm: 'zlib', 'zstd', 'blosc_zstd' or 'blosc_lz4'.
+        'zstd' is usually much faster than 'zlib', but runs without the
+        shuffle filter, so smooth float data compresses less well than
+        with 'zlib' and ``shuffle``; 'blosc_zstd' runs zstd after a byte
+        shuffle. 'blosc_lz4' is faster still but compresses less. All but
+        'zlib' require netCDF4>=1.6 with libnetcdf>=4.9 and its filter
+        plugins for writing and reading. Pass None to disable compression.
     complevel : int, default 4
-        Compression level (0-9).
+        Compression level (0-9 for 'zlib' and blosc, 1-22 for 'zstd').
     shuffle : bool, default True
-        Enable shuffle filter for better compression.
+        Enable the shuffle filter (blosc's own shuffle for blosc codecs)
+        for better compression. Has no effect with 'zstd', which netCDF4
+        writes without the shuffle filter; use 'blosc_zstd' instead.
     fletcher32 : bool, default False
         Enable Fletcher32 checksum for error detection.
+    output_format : str, default 'netcdf'
+        'netcdf' or 'zarr'. 'zarr' writes a zarr store (requires ``zarr``
+        and, for zarr 2, ``numcodecs``) with the same group structure, storing each
+        chunk as its own object so chunks can be written in parallel.
+        Compression then uses Blosc with ``complevel`` 0-9. ``mode``,
+        ``group`` and ``encoding`` apply as for netCDF (``mode='a'`` adds
+        the groups to an existing store); ``fletcher32``, ``diskless``,
+        ``format``, ``unlimited_dims`` and ``auto_complex`` are ignored.
+    adaptive_complevel : bool, default False
+        With 'zlib' netCDF output, choose the level per variable from a
+        level-1 trial on its first chunk: barely compressible variables
+        are written uncompressed, moderately compressible ones at level 1
+        and the rest at ``complevel``. Saves most of the CPU time spent on
+        high levels for data that gains little from them.
+    diskless : bool, default False
+        Build the netCDF file in memory and write it to ``output_path`` in
+        one piece when it is closed, instead of in many small writes. Can
+        speed up writes to network or spinning-disk filesystems; the whole
+        file has to fit in memory.
+    compute : bool, default True
+        If False, define the file and write all in-memory variables now but
+        defer writing Dask-backed variables, and return a
+        :class:`dask.delayed.Delayed` that writes them when computed
+        (requires ``dask``). As with :meth:`xarray.Dataset.to_netcdf`, the
+        file is closed before returning and reopened by each deferred
+        write, so nothing is left open if the Delayed is never computed,
+        and it can run on the threaded or distributed scheduler that is
+        active when ``write_netcdf`` is called. Cannot be combined with
+        ``diskless``.
     **kwargs
-        Additional arguments passed to Dataset.to_netcdf().
-    """
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        Options of :meth:`xarray.Dataset.to_netcdf` that apply to this
+        writer: ``format`` (default 'NETCDF4'), ``mode`` ('w' or 'a'),
+        ``group`` (group to write the dataset into), ``encoding``
+        (per-variable encoding keyed by the full variable name, applied on
+        top of the compression settings), ``unlimited_dims`` and
+        ``auto_complex``. ``engine`` must be 'netcdf4' and
+        ``invalid_netcdf`` must be False, since the file is written through
+        netCDF4.
 
-    var_names = [str(k) for k in dataset.data_vars.keys()]
-    group_map = _create_group_mapping(var_names)
-
-    # Ensure root group exists to preserve global attributes
-    if "" not in group_map:
-        group_map[""] = []
-
-    # Write root group first (empty string sorts first)
-    sorted_groups = sorted(group_map.items(), key=lambda x: (x[0] != "", x[0]))
-    first_write = True
+    Returns
+    -------
+    dask.delayed.Delayed or None
+        The deferred write if ``compute`` is False, otherwise None.
+    """
+    if output_format not in ("netcdf", "zarr"):
+        raise ValueError(
+            f"Unsupported output_format: {output_format}. "
+            f"Valid options: ['netcdf', 'zarr']"
+        )
 
-    for group_path, group_var_names in sorted_groups:
-        group_vars = {
-            name: dataset[name]
-            for name in group_var_names
-            if name in dataset
-        }
-        group_attrs = dataset.attrs if group_path == "" else {}
+    if adaptive_complevel and (
+        compression != "zlib" or output_format != "netcdf"
+    ):
+        raise ValueError(
+            "adaptive_complevel requires compression='zlib' and "
+            "output_format='netcdf'."
+        )
 
-        sub_ds = xr.Dataset(
-            data_vars=group_vars,
-            coords=dataset.coords,
-            attrs=group_attrs,
+    file_format = kwargs.pop("format", None) or "NETCDF4"
+    mode = kwargs.pop("mode", "w")
+    base_group = kwargs.pop("group", None)
+    user_encoding = kwargs.pop("encoding", None) or {}
+    unlimited_dims = kwargs.pop("unlimited_dims", None)
+    auto_complex = kwargs.pop("auto_complex", None)
+    engine = kwargs.pop("engine", None)
+    invalid_netcdf = kwargs.pop("invalid_netcdf", False)
+    if kwargs:
+        raise TypeError(
+            f"Unsupported keyword arguments: {sorted(kwargs)}"
         )
+    if engine not in (None, "netcdf4"):
+        raise ValueError(
+            f"Unsupported engine: {engine}. write_netcdf writes through "
+            f"netCDF4, so only engine='netcdf4' applies."
+        )
+    if invalid_netcdf:
+        raise ValueError(
+            "invalid_netcdf=True needs the h5netcdf engine and is not "
+            "supported by write_netcdf."
+        )
+    if mode not in ("w", "a"):
+        raise ValueError(
+            f"Unsupported mode: {mode}. Valid options: ['w', 'a']"
+        )
+    missing = [name for name in user_encoding if name not in dataset.variables]
+    if missing:
+        raise ValueError(f"Variables in encoding not found in dataset: {missing}")
+
+    if not compute:
+        try:
+            import dask
+        except ImportError as e:
+            raise ImportError(
+                "compute=False requires the 'dask' package."
+            ) from e
+        if diskless:
+            raise ValueError("diskless=True cannot be combined with compute=False.")
 
-        sub_ds = _clean_group_var_names(sub_ds, group_path)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        encoding = _create_encoding(
-            dataset=sub_ds,
+    if output_format == "zarr":
+        return _write_zarr(
+            dataset=dataset,
+            output_path=output_path,
             compression=compression,
             complevel=complevel,
             shuffle=shuffle,
-            fletcher32=fletcher32,
+            compute=compute,
+            mode=mode,
+            base_group=base_group,
+            user_encoding=user_encoding,
         )
 
-        sub_ds.to_netcdf(
-            output_path,
-            mode="w" if first_write else "a",
-            group=group_path if group_path else None,
-            encoding=encoding,
-            **kwargs,
-        )
-        first_write = False
+    # Shared by all groups; also validates the options before the output
+    # file is created
+    var_enc = _compression_encoding(
+        compression=compression,
+        complevel=complevel,
+        shuffle=shuffle,
+        fletcher32=fletcher32,
+    )
+
+    # Keep one file handle open for all groups instead of re-opening the
+    # file in append mode per group. xarray still handles CF encoding.
+    writer = ArrayWriter()
+    # In netCDF-3 files every switch from defining to writing data may
+    # rewrite the header, so all variables are defined before any is
+    # written instead of one variable at a time
+    nc_kwargs = {"auto_complex": auto_complex} if auto_complex else {}
+    # Opened through a file manager, as xarray does, so that deferred
+    # writes can be pickled and reopen the file wherever they run
+    lock = combine_locks([HDF5_LOCK, NETCDFC_LOCK, get_write_lock(output_path)])
+    manager = xr.backends.CachingFileManager(
+        nc.Dataset, output_path, mode=mode, lock=lock,
+        kwargs=dict(
+            format=file_format, diskless=diskless, persist=diskless,
+            **nc_kwargs,
+        ),
+    )
+    stores = []
+    try:
+        # In append mode the existing file decides the format
+        is_hdf5 = manager.acquire().data_model.startswith("NETCDF4")
+        for group_path, sub_ds in _iter_group_datasets(dataset):
+            encoding = _create_encoding(
+                sub_ds, var_enc, chunk=True, adaptive=adaptive_complevel,
+            )
+            encoding = _apply_user_encoding(
+                encoding, sub_ds, group_path, user_encoding,
+            )
+
+            store = xr.backends.NetCDF4DataStore(
+                manager,
+                group="/".join(p for p in (base_group, group_path) if p) or None,
+                mode="a",
+                lock=lock,
+            )
+            stores.append(store)
+
+            # Parts are written one after another on purpose: HDF5 (and so
+            # netCDF4) is not thread-safe, and xarray serialises writes with
+            # a global lock, so a thread pool here could not overlap the
+            # compression of different variables.
+            parts = _split_group_dataset(sub_ds) if is_hdf5 else [sub_ds]
+            for part in parts:
+                part.dump_to_store(
+                    store,
+                    writer=writer,
+                    encoding={k: v for k, v in encoding.items() if k in part},
+                    # xarray rejects unlimited dimensions that already
+                    # exist but are not used by this part
+                    unlimited_dims=[
+                        dim for dim in unlimited_dims or () if dim in part.dims
+                    ],
+                )
+                # Flush written chunks instead of holding them until close
+                nc_grp = store.ds
+                for name in part.variables:
+                    _release_var_chunk_cache(nc_grp.variables[str(name)])
+
+        if not compute:
+            # Deferred writes may run in other processes: like xarray,
+            # reopen the file for each write and close it afterwards
+            for store in stores:
+                store.autoclose = True
+            writes = writer.sync(compute=False)
+            manager.close()
+            return dask.delayed(_close_after_writes)(writes, manager)
+
+        # Write any Dask-backed variables before the file is closed
+        writer.sync()
+    except BaseException:
+        manager.close()
+        raise
+
+    manager.close()
@@ -3,3 +3,18 @@
 # Set the default compression level based on
 # optimal performance and compression ratio
 DEFAULT_NETCDF_COMPLEVEL = 4
+
+# Target size of each chunk-aligned slab when reading a netCDF variable
+NETCDF_READ_SLAB_BYTES = 32 * 1024 * 1024
+
+# Target size of automatically chosen chunks for compressed netCDF output;
+# small enough that partial reads only decompress the chunks they touch
+NETCDF_WRITE_CHUNK_BYTES = 1024 * 1024
+
+# zlib level-1 ratios (compressed / raw size) of a variable's first chunk
+# above which adaptive compression writes it uncompressed or at level 1
+NETCDF_ADAPTIVE_SKIP_RATIO = 0.9
+NETCDF_ADAPTIVE_FAST_RATIO = 0.55
+
+# Upper bound for the automatically sized per-variable HDF5 chunk cache
+NETCDF_CHUNK_CACHE_MAX_BYTES = 64 * 1024 * 1024
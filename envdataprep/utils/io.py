@@ -4,6 +4,15 @@ import os
 import numpy as np
 
 
+def is_remote_path(path: str) -> bool:
+    """Return True if ``path`` is a URL such as ``s3://...`` or ``https://...``.
+
+    Local paths (including ``file://`` URLs) return False.
+    """
+    scheme, sep, _ = path.partition("://")
+    return bool(sep) and scheme != "file"
+
+
 def build_subset_path(
     input_path: str,
     output_dir: str | None = None,
@@ -40,8 +49,7 @@ def build_subset_path(
     elif use_input_name:
         filename = os.path.basename(input_path)
     else:
-        base = os.path.splitext(os.path.basename(input_path))[0]
-        extension = os.path.splitext(input_path)[1]
+        base, extension = os.path.splitext(os.path.basename(input_path))
         filename = f"{base}{suffix}{extension}"
     return os.path.join(output_dir, filename)
 
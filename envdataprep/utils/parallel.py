@@ -3,12 +3,16 @@
 import os
 
 from collections.abc import Callable
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import partial
 from typing import Any
 
 from tqdm import tqdm
 
+# Set once per worker process by _init_worker
+_worker_process_func: Callable | None = None
+_worker_func_kwargs: dict[str, Any] = {}
+
 
 def _process_single_file(file_path, process_func, func_kwargs):
     """Wrapper to handle exceptions for single file processing."""
@@ -19,12 +23,30 @@ def _process_single_file(file_path, process_func, func_kwargs):
         return file_path, False, None, str(e)
 
 
+def _init_worker(process_func, func_kwargs):
+    """Install the processing function and its kwargs in a worker process.
+
+    They are pickled once per worker here instead of once per task.
+    """
+    global _worker_process_func, _worker_func_kwargs
+    _worker_process_func = process_func
+    _worker_func_kwargs = func_kwargs
+
+
+def _process_in_worker(file_path):
+    """Process one file with the function installed by _init_worker."""
+    return _process_single_file(
+        file_path, _worker_process_func, _worker_func_kwargs
+    )
+
+
 def process_files_parallel(
     files: list[str],
     process_func: Callable,
     func_kwargs: dict[str, Any] | None = None,
     max_workers: int | None = None,
     show_progress: bool = True,
+    executor: str = "process",
 ) -> tuple[list[str], list[tuple[str, str]]]:
     """Process multiple files in parallel.
 
@@ -39,15 +61,27 @@ def process_files_parallel(
     max_workers : int, optional
         Number of parallel workers. If None, uses os.cpu_count().
     show_progress : bool, default True
-        Whether to show progress bar (requires tqdm).
+        Whether to show a tqdm progress bar.
+    executor : str, default "process"
+        "process" or "thread". Threads avoid starting worker processes and
+        pickling arguments, but only help when ``process_func`` releases
+        the GIL and is thread-safe. netCDF4/HDF5 are not thread-safe, so
+        netCDF processing must use "process".
 
     Returns
     -------
     tuple[list[str], list[tuple[str, str]]]
-        (successful_files, failed_files_with_errors)
+        (successful_files, failed_files_with_errors), each in the order of
+        ``files``.
     """
     func_kwargs = func_kwargs or {}
 
+    if executor not in ("process", "thread"):
+        raise ValueError(
+            f"Unsupported executor: {executor}. "
+            f"Valid options: ['process', 'thread']"
+        )
+
     # If max_workers is not set, use the number of CPUs - 1, but not more than the number of files
     if max_workers is None:
         max_workers = os.cpu_count() - 1
@@ -59,28 +93,46 @@ def process_files_parallel(
     successful = []
     failed = []
 
-    # Use partial to bind arguments
-    worker_func = partial(_process_single_file, process_func=process_func, func_kwargs=func_kwargs)
-
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(worker_func, f): f for f in files}
+    if executor == "thread":
+        # Threads share memory, so arguments are bound directly
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        worker_func = partial(
+            _process_single_file,
+            process_func=process_func,
+            func_kwargs=func_kwargs,
+        )
+        chunksize = 1
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(process_func, func_kwargs),
+        )
+        worker_func = _process_in_worker
+        # Send files in batches, about four per worker: keeps the load
+        # balanced while cutting the number of round trips to the workers
+        chunksize = max(1, len(files) // (max_workers * 4))
+
+    with pool:
+        # map yields results in input order, so a slow file holds back the
+        # progress bar and failure reports for the files after it until
+        # it finishes; batching needs map rather than submit/as_completed
+        results = pool.map(worker_func, files, chunksize=chunksize)
 
         if show_progress:
-            try:
-                iterator = tqdm(as_completed(futures), total=len(files), desc="Processing")
-            except ImportError:
-                print("Install tqdm for progress bar: pip install tqdm")
-                iterator = as_completed(futures)
+            iterator = tqdm(results, total=len(files), desc="Processing")
         else:
-            iterator = as_completed(futures)
+            iterator = results
 
-        for future in iterator:
-            file_path, success, result, error = future.result()
+        for file_path, success, result, error in iterator:
             if success:
                 successful.append(file_path)
             else:
                 failed.append((file_path, error))
                 if show_progress:
-                    print(f"\nFailed: {os.path.basename(file_path)} - {error}")
+                    # Printed above the bar instead of breaking it
+                    tqdm.write(
+                        f"Failed: {os.path.basename(file_path)} - {error}"
+                    )
 
     return successful, failed
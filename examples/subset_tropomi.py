@@ -1,6 +1,5 @@
 """Minimal demo: subsetting TROPOMI products as netCDF files."""
 
-import glob
 import os
 
 import envdataprep as edp
@@ -9,8 +8,14 @@ import envdataprep as edp
 INPUT_DIR = "path/to/input/directory"
 OUTPUT_DIR = "path/to/output/directory"
 
-# Input files (using TROPOMI as an example)
-input_files = glob.glob(os.path.join(INPUT_DIR, "S5P*.nc"))
+# Input files (using TROPOMI as an example). os.scandir lists the
+# directory without a stat call per file; sorting the names puts the
+# orbits of one product in sensing-time order.
+with os.scandir(INPUT_DIR) as entries:
+    input_files = sorted(
+        entry.path for entry in entries
+        if entry.name.startswith("S5P") and entry.name.endswith(".nc")
+    )
 
 # Explore all available variables
 all_vars = edp.list_netcdf_vars(input_files[0])
@@ -33,10 +38,20 @@ selected_vars = [
     "PRODUCT/SUPPORT_DATA/INPUT_DATA/northward_wind",
 ]
 
+# Compression for the output files. "blosc_zstd" runs Zstandard after a
+# byte shuffle, which compresses float data about as well as zlib but much
+# faster (plain "zstd" skips the shuffle and gives larger files). Levels
+# are 0-9. Readers need netCDF-C >= 4.9 with the Blosc filter plugin, so
+# use "zlib" (default) if the files are shared with older tools.
+COMPRESSION = "blosc_zstd"
+COMPLEVEL = 5
+
 # Subset the netCDF files in parallel
 edp.subset_netcdf(
     nc_input=input_files,
     output_dir=OUTPUT_DIR,
     keep_vars=selected_vars,
+    compression=COMPRESSION,
+    complevel=COMPLEVEL,
     workers=8,
 )
@@ -0,0 +1,51 @@
+"""Tests for the I/O utility functions."""
+
+import os
+
+import pytest
+
+from envdataprep.utils.io import build_subset_path, is_remote_path
+
+
+def test_build_subset_path_adds_suffix(tmp_path):
+    input_path = str(tmp_path / "S5P_NO2.nc")
+    assert build_subset_path(input_path) == str(tmp_path / "S5P_NO2_SUB.nc")
+    assert build_subset_path(input_path, suffix="_small") == str(
+        tmp_path / "S5P_NO2_small.nc"
+    )
+
+
+def test_build_subset_path_name_options(tmp_path):
+    input_path = str(tmp_path / "in" / "S5P_NO2.nc")
+    output_dir = str(tmp_path / "out")
+
+    assert build_subset_path(
+        input_path, output_dir=output_dir, use_input_name=True
+    ) == os.path.join(output_dir, "S5P_NO2.nc")
+    # output_name takes priority over the other options
+    assert build_subset_path(
+        input_path,
+        output_dir=output_dir,
+        output_name="custom.nc",
+        use_input_name=True,
+    ) == os.path.join(output_dir, "custom.nc")
+    assert os.path.isdir(output_dir)
+
+
+def test_build_subset_path_only_splits_last_extension(tmp_path):
+    input_path = str(tmp_path / "data.v2.nc4")
+    assert build_subset_path(input_path) == str(tmp_path / "data.v2_SUB.nc4")
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("s3://bucket/S5P_NO2.nc", True),
+        ("https://example.org/S5P_NO2.nc", True),
+        ("file:///data/S5P_NO2.nc", False),
+        ("/data/S5P_NO2.nc", False),
+        ("relative/S5P_NO2.nc", False),
+    ],
+)
+def test_is_remote_path(path, expected):
+    assert is_remote_path(path) is expected
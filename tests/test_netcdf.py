@@ -0,0 +1,640 @@
+"""Round-trip tests for the netCDF reading, writing and subsetting functions."""
+
+import json
+import os
+
+import netCDF4 as nc
+import numpy as np
+import pytest
+import xarray as xr
+
+from envdataprep.core.netcdf import (
+    extract_netcdf_as_dataset,
+    pack_dataset_vars,
+    subset_netcdf,
+    write_netcdf,
+)
+from envdataprep.core.netcdf import subset as subset_module
+from envdataprep.core.netcdf.read import _extract_nc_vars
+from envdataprep.dummy_data import (
+    make_dummy_grouped_nc_dataset,
+    write_dummy_grouped_nc,
+)
+
+
+def _write_sample_nc(path, file_format="NETCDF4"):
+    """Write a small file with a root and a nested group variable."""
+    rng = np.random.default_rng(0)
+    is_hdf5 = file_format.startswith("NETCDF4")
+    comp = {"zlib": True, "complevel": 4, "shuffle": True} if is_hdf5 else {}
+
+    with nc.Dataset(path, "w", format=file_format) as root:
+        root.title = "sample"
+        root.createDimension("time", 12)
+        root.createDimension("x", 40)
+        time = root.createVariable("time", "f8", ("time",))
+        time[:] = np.arange(12)
+        temp = root.createVariable(
+            "temp", "f4", ("time", "x"),
+            chunksizes=(6, 40) if is_hdf5 else None, **comp,
+        )
+        temp.units = "K"
+        temp[:] = 280 + rng.random((12, 40), dtype="f4")
+        flag = root.createVariable(
+            "flag", "i2", ("time", "x"), fill_value=-1,
+            chunksizes=(6, 40) if is_hdf5 else None, **comp,
+        )
+        flag[:] = rng.integers(0, 10, (12, 40))
+
+        has_groups = file_format == "NETCDF4"
+        grp = root.createGroup("PRODUCT") if has_groups else root
+        name = "radiance" if has_groups else "PRODUCT_radiance"
+        rad = grp.createVariable(
+            name, "f4", ("time", "x"),
+            chunksizes=(12, 20) if is_hdf5 else None, **comp,
+        )
+        rad.long_name = "radiance"
+        rad[:] = rng.random((12, 40), dtype="f4")
+
+
+def _nc_attrs(var):
+    """Return a variable's attributes as a dict."""
+    return {key: var.getncattr(key) for key in var.ncattrs()}
+
+
+def _nc_var_paths(grp, prefix=""):
+    """Return the paths of all variables in a netCDF group tree."""
+    paths = [prefix + name for name in grp.variables]
+    for name, sub_grp in grp.groups.items():
+        paths += _nc_var_paths(sub_grp, f"{prefix}{name}/")
+    return paths
+
+
+@pytest.mark.parametrize(
+    "file_format",
+    ["NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF4_CLASSIC", "NETCDF4"],
+)
+def test_extract_and_write_round_trip(tmp_path, file_format):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input, file_format)
+    var_paths = ["temp", "flag"]
+
+    ds = extract_netcdf_as_dataset(str(nc_input), var_paths)
+    output_path = tmp_path / "out" / "roundtrip.nc"
+    write_netcdf(
+        ds,
+        str(output_path),
+        compression=None if file_format.startswith("NETCDF3") else "zlib",
+        format=file_format,
+    )
+
+    with nc.Dataset(output_path) as out, nc.Dataset(nc_input) as src:
+        assert out.data_model == file_format
+        for var_path in var_paths:
+            np.testing.assert_array_equal(out[var_path][:], src[var_path][:])
+        assert out["temp"].units == "K"
+
+
+@pytest.mark.parametrize("file_format", ["NETCDF3_64BIT_OFFSET", "NETCDF4"])
+def test_subset_streams_variables(tmp_path, file_format):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input, file_format)
+
+    subset_netcdf(
+        str(nc_input),
+        drop_vars=["flag"],
+        output_dir=str(tmp_path / "out"),
+        compression=None if file_format.startswith("NETCDF3") else "zlib",
+        format=file_format,
+    )
+
+    with (
+        nc.Dataset(tmp_path / "out" / "sample_SUB.nc") as out,
+        nc.Dataset(nc_input) as src,
+    ):
+        assert "flag" not in out.variables
+        assert out.title == "sample"
+        for var_path in _nc_var_paths(src):
+            if var_path == "flag":
+                continue
+            np.testing.assert_array_equal(out[var_path][:], src[var_path][:])
+            out_attrs = _nc_attrs(out[var_path])
+            assert out_attrs.items() >= _nc_attrs(src[var_path]).items()
+
+
+@pytest.mark.parametrize("shadow_coord", [False, True])
+def test_subset_grouped_dummy_round_trip(tmp_path, shadow_coord):
+    nc_input = str(tmp_path / "grouped.nc")
+    if shadow_coord:
+        # "PRODUCT/row" replaces the root "row" coordinate in its group
+        ds = make_dummy_grouped_nc_dataset()
+        ds["PRODUCT/row"] = ("row", ds["row"].values * 10, {"units": "1"})
+        write_netcdf(ds, nc_input)
+    else:
+        write_dummy_grouped_nc(nc_input)
+
+    subset_netcdf(
+        nc_input,
+        drop_vars=["PRODUCT/longitude"],
+        output_dir=str(tmp_path / "out"),
+        show_progress=False,
+    )
+
+    with (
+        nc.Dataset(tmp_path / "out" / "grouped_SUB.nc") as out,
+        nc.Dataset(nc_input) as src,
+    ):
+        assert "longitude" not in out["PRODUCT"].variables
+        assert out.title == src.title
+        expected = set(_nc_var_paths(src)) - {"PRODUCT/longitude"}
+        assert set(_nc_var_paths(out)) == expected
+        for var_path in expected:
+            np.testing.assert_array_equal(out[var_path][:], src[var_path][:])
+        if shadow_coord:
+            np.testing.assert_array_equal(
+                out["PRODUCT/row"][:], np.arange(6) * 10
+            )
+            np.testing.assert_array_equal(out["row"][:], np.arange(6))
+
+
+def test_deferred_read_indexing(tmp_path):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    with nc.Dataset(nc_input) as root_ds:
+        expected = root_ds["temp"][:]
+        ds = _extract_nc_vars(
+            root_ds=root_ds,
+            input_path=str(nc_input),
+            var_paths=["temp"],
+            defer_read=True,
+        )
+        np.testing.assert_array_equal(ds["temp"].values, expected)
+        np.testing.assert_array_equal(
+            ds["temp"].isel(x=slice(5, 10)).values, expected[:, 5:10]
+        )
+        np.testing.assert_array_equal(
+            ds["temp"].isel(time=[0, 3, 7]).values, expected[[0, 3, 7]]
+        )
+
+
+def test_subset_skip_existing(tmp_path, monkeypatch):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+    output_path = tmp_path / "sample_SUB.nc"
+
+    writes = []
+
+    def counting_write(*args, **kwargs):
+        writes.append(kwargs["output_path"])
+        return write_netcdf(*args, **kwargs)
+
+    monkeypatch.setattr(subset_module, "write_netcdf", counting_write)
+
+    def run(**kwargs):
+        subset_netcdf(
+            str(nc_input), keep_vars=["temp"], skip_existing=True, **kwargs
+        )
+
+    run()
+    assert len(writes) == 1
+    with open(f"{output_path}.meta.json") as f:
+        meta = json.load(f)
+    assert meta["input"] == str(nc_input)
+
+    # Same input and settings: skipped
+    run()
+    assert len(writes) == 1
+
+    # Other settings: rewritten
+    run(complevel=1)
+    assert len(writes) == 2
+
+    # Changed input: rewritten
+    stat = os.stat(nc_input)
+    os.utime(nc_input, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    run(complevel=1)
+    assert len(writes) == 3
+
+    # Output without its sidecar file: rewritten
+    os.remove(f"{output_path}.meta.json")
+    run(complevel=1)
+    assert len(writes) == 4
+
+
+def test_pack_dataset_vars_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.normal(280, 10, (12, 40))
+    values[0, :5] = np.nan
+    ds = xr.Dataset({"PRODUCT/temp": (("time", "x"), values)})
+
+    packed = pack_dataset_vars(ds, ["PRODUCT/temp"])
+    output_path = tmp_path / "packed.nc"
+    write_netcdf(packed, str(output_path))
+
+    with nc.Dataset(output_path) as out:
+        nc_var = out["PRODUCT/temp"]
+        assert nc_var.dtype == np.int16
+        scale_factor = nc_var.scale_factor
+        assert nc_var._FillValue == np.iinfo("int16").min
+
+    with xr.open_dataset(output_path, group="PRODUCT") as out:
+        unpacked = out["temp"].values
+    assert np.array_equal(np.isnan(unpacked), np.isnan(values))
+    np.testing.assert_allclose(
+        unpacked, values, rtol=0, atol=scale_factor / 2 * 1.001
+    )
+
+
+def test_pack_dataset_vars_float32_range_ends(tmp_path):
+    # float32 scale_factor/add_offset are rounded; the smallest and largest
+    # values must still encode to valid codes rather than the fill value
+    rng = np.random.default_rng(1)
+    data_vars = {
+        # Range reported to read back as NaN at its minimum
+        "v0": ("x", np.linspace(-4475.6875, -4449.5, 50, dtype="f4")),
+    }
+    for i in range(1, 200):
+        low = rng.uniform(-1e4, 1e4)
+        span = 10 ** rng.uniform(-2, 3)
+        data_vars[f"v{i}"] = (
+            "x", (low + span * rng.random(50)).astype("f4"),
+        )
+    ds = xr.Dataset(data_vars)
+
+    packed = pack_dataset_vars(ds, list(ds.data_vars))
+    output_path = tmp_path / "packed.nc"
+    write_netcdf(packed, str(output_path))
+
+    with xr.open_dataset(output_path) as out:
+        for name, var in ds.data_vars.items():
+            unpacked = out[name].values
+            assert not np.isnan(unpacked).any(), name
+            # float32 data can be coarser than a step, so allow one ulp
+            scale_factor = float(out[name].encoding["scale_factor"])
+            atol = scale_factor / 2 + np.spacing(np.abs(var.values))
+            assert (np.abs(unpacked - var.values) <= atol * 1.001).all(), name
+
+
+def test_subset_pack_vars(tmp_path):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    subset_netcdf(
+        str(nc_input), keep_vars=["temp", "flag"], pack_vars=["temp"]
+    )
+
+    with nc.Dataset(tmp_path / "sample_SUB.nc") as out:
+        assert out["temp"].dtype == np.int16
+        assert out["temp"].units == "K"
+        with nc.Dataset(nc_input) as src:
+            np.testing.assert_allclose(
+                out["temp"][:], src["temp"][:],
+                rtol=0, atol=out["temp"].scale_factor,
+            )
+
+
+def test_pack_dataset_vars_rejects_invalid_vars():
+    ds = xr.Dataset({
+        "temp": ("x", np.arange(4.0)),
+        "count": ("x", np.arange(4)),
+    })
+    with pytest.raises(ValueError, match="Only float"):
+        pack_dataset_vars(ds, ["count"])
+    with pytest.raises(ValueError, match="not found"):
+        pack_dataset_vars(ds, ["missing"])
+    with pytest.raises(ValueError, match="Unsupported dtype"):
+        pack_dataset_vars(ds, ["temp"], dtype="uint8")
+
+
+def test_subset_raw_copy_matches_normal_write(tmp_path):
+    pytest.importorskip("h5py")
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    keep_vars = ["temp", "flag", "PRODUCT/radiance"]
+    for name, copy_raw in (("slow.nc", False), ("fast.nc", True)):
+        subset_netcdf(
+            str(nc_input),
+            keep_vars=keep_vars,
+            output_name=name,
+            copy_raw_chunks=copy_raw,
+        )
+
+    with (
+        nc.Dataset(tmp_path / "slow.nc") as slow,
+        nc.Dataset(tmp_path / "fast.nc") as fast,
+    ):
+        assert sorted(_nc_var_paths(fast)) == sorted(_nc_var_paths(slow))
+        assert fast.title == slow.title
+        for var_path in _nc_var_paths(slow):
+            slow_var, fast_var = slow[var_path], fast[var_path]
+            np.testing.assert_array_equal(fast_var[:], slow_var[:])
+            # assert_equal treats NaN fill values as equal
+            np.testing.assert_equal(_nc_attrs(fast_var), _nc_attrs(slow_var))
+            assert fast_var.filters() == slow_var.filters()
+
+
+def test_subset_raw_copy_keeps_input_chunks(tmp_path):
+    pytest.importorskip("h5py")
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    subset_netcdf(
+        str(nc_input),
+        keep_vars=["PRODUCT/radiance"],
+        output_name="fast.nc",
+        copy_raw_chunks=True,
+    )
+
+    with nc.Dataset(tmp_path / "fast.nc") as out:
+        assert out["PRODUCT/radiance"].chunking() == [12, 20]
+
+
+def test_subset_raw_copy_skips_other_filters(tmp_path):
+    pytest.importorskip("h5py")
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    # complevel differs from the input's, so everything is recompressed
+    subset_netcdf(
+        str(nc_input),
+        keep_vars=["temp", "PRODUCT/radiance"],
+        output_name="fast.nc",
+        complevel=1,
+        copy_raw_chunks=True,
+    )
+
+    with nc.Dataset(tmp_path / "fast.nc") as out, nc.Dataset(nc_input) as src:
+        for var_path in ("temp", "PRODUCT/radiance"):
+            assert out[var_path].filters()["complevel"] == 1
+            np.testing.assert_array_equal(out[var_path][:], src[var_path][:])
+
+
+def _write_unlimited_nc(path):
+    """Write a file whose time dimension is unlimited."""
+    rng = np.random.default_rng(0)
+    with nc.Dataset(path, "w") as root:
+        root.createDimension("time", None)
+        root.createDimension("x", 40)
+        # Default chunking on an unlimited dimension is larger than the
+        # 12 steps written
+        delta_time = root.createVariable("delta_time", "f8", ("time",))
+        delta_time[:] = np.arange(12)
+        temp = root.createVariable(
+            "temp", "f4", ("time", "x"),
+            zlib=True, complevel=4, chunksizes=(6, 40),
+        )
+        temp[:] = rng.random((12, 40), dtype="f4")
+
+
+@pytest.mark.parametrize("unlimited_dims", [None, ["time"]])
+def test_subset_raw_copy_unlimited_dims(tmp_path, unlimited_dims):
+    pytest.importorskip("h5py")
+    nc_input = tmp_path / "unlimited.nc"
+    _write_unlimited_nc(nc_input)
+
+    # temp is recompressed, so xarray creates time before delta_time is
+    # copied
+    subset_netcdf(
+        str(nc_input),
+        keep_vars=["delta_time", "temp"],
+        complevel=1,
+        copy_raw_chunks=True,
+        unlimited_dims=unlimited_dims,
+    )
+
+    with (
+        nc.Dataset(tmp_path / "unlimited_SUB.nc") as out,
+        nc.Dataset(nc_input) as src,
+    ):
+        assert out.dimensions["time"].isunlimited() == bool(unlimited_dims)
+        for var_path in ("delta_time", "temp"):
+            np.testing.assert_array_equal(out[var_path][:], src[var_path][:])
+        if unlimited_dims:
+            # Copied with the input's chunking
+            assert out["delta_time"].chunking() == src["delta_time"].chunking()
+
+
+def test_write_zarr_mode_group_encoding(tmp_path):
+    pytest.importorskip("zarr")
+    output_path = str(tmp_path / "out.zarr")
+    ds = xr.Dataset({
+        "temp": ("x", np.arange(500.0)),
+        "PRODUCT/radiance": ("x", np.ones(500)),
+    })
+
+    write_netcdf(ds, output_path, output_format="zarr")
+    # Added to the existing store instead of replacing it
+    write_netcdf(
+        xr.Dataset({"flag": ("y", np.arange(3))}),
+        output_path,
+        output_format="zarr",
+        mode="a",
+    )
+    write_netcdf(
+        ds,
+        output_path,
+        output_format="zarr",
+        mode="a",
+        group="copy",
+        encoding={"PRODUCT/radiance": {"dtype": "float32"}},
+    )
+
+    with xr.open_zarr(output_path) as out:
+        assert sorted(out.data_vars) == ["flag", "temp"]
+    with xr.open_zarr(output_path, group="copy/PRODUCT") as out:
+        assert out["radiance"].dtype == np.float32
+        np.testing.assert_array_equal(out["radiance"].values, 1.0)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_adaptive_complevel_skips_incompressible(tmp_path, lazy):
+    rng = np.random.default_rng(0)
+    nc_input = tmp_path / "source.nc"
+    xr.Dataset({
+        "noise": (("time", "x"), rng.integers(-2**62, 2**62, (50, 400))),
+        "zeros": (("time", "x"), np.zeros((50, 400))),
+    }).to_netcdf(
+        nc_input,
+        encoding={
+            "noise": {"zlib": True, "complevel": 4},
+            "zeros": {"zlib": True, "complevel": 4},
+        },
+    )
+
+    # Lazily read variables carry the source's compression in their own
+    # encoding, which must not be reused for the incompressible one
+    ds = extract_netcdf_as_dataset(str(nc_input), ["noise", "zeros"], lazy=lazy)
+    output_path = tmp_path / "out.nc"
+    with ds:
+        write_netcdf(ds, str(output_path), adaptive_complevel=True)
+
+    with nc.Dataset(output_path) as out, nc.Dataset(nc_input) as src:
+        assert not out["noise"].filters()["zlib"]
+        assert out["zeros"].filters()["zlib"]
+        for name in ("noise", "zeros"):
+            np.testing.assert_array_equal(out[name][:], src[name][:])
+
+
+@pytest.mark.parametrize("use_dask", [True, False])
+def test_write_netcdf_deferred(tmp_path, use_dask):
+    dask = pytest.importorskip("dask")
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset(
+        {
+            "temp": (("time", "x"), rng.random((40, 50))),
+            "PRODUCT/radiance": (("time", "x"), rng.random((40, 50))),
+        },
+        coords={"time": np.arange(40)},
+    )
+    # Without Dask variables everything is written before returning and
+    # there are no deferred writes left
+    source = ds.chunk({"time": 10}) if use_dask else ds
+    output_path = tmp_path / "deferred.nc"
+
+    with dask.config.set(scheduler="threads"):
+        delayed = write_netcdf(source, str(output_path), compute=False)
+        delayed.compute()
+
+    # The file is closed again, so it can be opened for writing
+    with nc.Dataset(output_path, "a") as out:
+        np.testing.assert_array_equal(out["temp"][:], ds["temp"].values)
+        np.testing.assert_array_equal(
+            out["PRODUCT/radiance"][:], ds["PRODUCT/radiance"].values
+        )
+        np.testing.assert_array_equal(out["time"][:], ds["time"].values)
+
+
+def test_write_netcdf_deferred_closes_uncomputed(tmp_path):
+    pytest.importorskip("dask")
+    ds = xr.Dataset({"temp": ("x", np.arange(500.0))}).chunk({"x": 100})
+    output_path = tmp_path / "deferred.nc"
+
+    delayed = write_netcdf(ds, str(output_path), compute=False)
+    del delayed
+
+    # Nothing holds the file open even though the writes never ran
+    with nc.Dataset(output_path, "a") as out:
+        assert "temp" in out.variables
+
+
+@pytest.mark.parametrize("engine", ["netcdf4", "h5netcdf"])
+def test_extract_lazy_matches_eager(tmp_path, engine):
+    if engine == "h5netcdf":
+        pytest.importorskip("h5netcdf")
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+    var_paths = ["temp", "flag", "PRODUCT/radiance"]
+
+    eager = extract_netcdf_as_dataset(str(nc_input), var_paths)
+    lazy = extract_netcdf_as_dataset(
+        str(nc_input), var_paths, lazy=True, engine=engine
+    )
+    with lazy:
+        assert sorted(lazy.data_vars) == sorted(eager.data_vars)
+        assert lazy.attrs == eager.attrs
+        for var_path in var_paths:
+            np.testing.assert_array_equal(
+                lazy[var_path].values, eager[var_path].values
+            )
+            assert lazy[var_path].dims == eager[var_path].dims
+
+
+def test_extract_lazy_warns_on_missing_paths(tmp_path):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    with pytest.warns(UserWarning, match="PRODUCT/missing"):
+        ds = extract_netcdf_as_dataset(
+            str(nc_input), ["temp", "PRODUCT/missing"], lazy=True
+        )
+    with ds:
+        assert list(ds.data_vars) == ["temp"]
+
+
+@pytest.mark.parametrize("engine", ["netcdf4", "h5netcdf"])
+def test_extract_lazy_releases_file(tmp_path, engine):
+    if engine == "h5netcdf":
+        pytest.importorskip("h5netcdf")
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+
+    ds = extract_netcdf_as_dataset(
+        str(nc_input), ["temp", "PRODUCT/radiance"], lazy=True, engine=engine
+    )
+    ds.close()
+    # Writing needs the file to be closed by every reader
+    with nc.Dataset(nc_input, "a") as root:
+        root.title = "edited"
+
+    with extract_netcdf_as_dataset(
+        str(nc_input), ["temp"], lazy=True, engine=engine
+    ) as ds:
+        ds["temp"].load()
+    with nc.Dataset(nc_input, "a") as root:
+        assert root.title == "edited"
+
+
+def test_extract_memmap_matches_copy(tmp_path):
+    pytest.importorskip("h5py")
+    nc_input = tmp_path / "contiguous.nc"
+    rng = np.random.default_rng(0)
+    with nc.Dataset(nc_input, "w") as root:
+        root.createDimension("time", 12)
+        root.createDimension("x", 40)
+        # Contiguous, uncompressed variables can be mapped; big-endian
+        # storage must keep its byte order
+        root.createVariable("temp", "f4", ("time", "x"), contiguous=True)
+        root["temp"][:] = rng.random((12, 40))
+        grp = root.createGroup("PRODUCT")
+        grp.createVariable(
+            "count", ">i4", ("time", "x"), contiguous=True, endian="big"
+        )
+        grp["count"][:] = rng.integers(0, 1000, (12, 40))
+        # Compressed variables are read as usual
+        grp.createVariable("radiance", "f4", ("time", "x"), zlib=True)
+        grp["radiance"][:] = rng.random((12, 40))
+
+    var_paths = ["temp", "PRODUCT/count", "PRODUCT/radiance"]
+    copied = extract_netcdf_as_dataset(str(nc_input), var_paths)
+    mapped = extract_netcdf_as_dataset(str(nc_input), var_paths, memmap=True)
+
+    xr.testing.assert_identical(mapped, copied)
+    assert not mapped["temp"].values.flags.writeable
+    assert not mapped["PRODUCT/count"].values.flags.writeable
+    assert mapped["PRODUCT/radiance"].values.flags.writeable
+
+
+def test_write_netcdf_diskless_matches_direct(tmp_path):
+    nc_input = tmp_path / "sample.nc"
+    _write_sample_nc(nc_input)
+    ds = extract_netcdf_as_dataset(
+        str(nc_input), ["temp", "flag", "PRODUCT/radiance"]
+    )
+
+    direct_path = str(tmp_path / "direct.nc")
+    diskless_path = str(tmp_path / "diskless.nc")
+    write_netcdf(ds, direct_path)
+    write_netcdf(ds, diskless_path, diskless=True)
+
+    # The in-memory file must be persisted in full on close
+    with (
+        nc.Dataset(diskless_path) as out,
+        nc.Dataset(direct_path) as ref,
+    ):
+        assert out.title == ref.title
+        assert _nc_var_paths(out) == _nc_var_paths(ref)
+        for var_path in _nc_var_paths(ref):
+            np.testing.assert_array_equal(out[var_path][:], ref[var_path][:])
+            out_attrs = _nc_attrs(out[var_path])
+            ref_attrs = _nc_attrs(ref[var_path])
+            assert out_attrs.keys() == ref_attrs.keys()
+            for key, value in ref_attrs.items():
+                np.testing.assert_array_equal(out_attrs[key], value)
+            assert out[var_path].filters() == ref[var_path].filters()
+
+    with pytest.raises(ValueError, match="diskless"):
+        write_netcdf(
+            ds, str(tmp_path / "deferred.nc"), diskless=True, compute=False
+        )